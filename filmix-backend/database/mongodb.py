@@ -1,5 +1,8 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import ConnectionFailure
+from database.settings import MongoSettings
+from utils.tracing import MongoCommandTracer
+import asyncio
 import logging
 import os
 
@@ -9,6 +12,18 @@ logger = logging.getLogger("filmix.database")
 class MongoDB:
     client: AsyncIOMotorClient = None
     database = None
+    # Та же база, но с настраиваемым read preference (для чтений без требований к свежести)
+    read_database = None
+    settings: MongoSettings = None
+    index_task: asyncio.Task = None
+
+# Индексы коллекции movie; создаются в фоне, чтобы не задерживать старт
+MOVIE_INDEXES = [
+    # Поиск и upsert по ID из TMDB
+    [("tmdb_id", 1), ("content_type", 1)],
+    # Группировка по франшизам
+    [("series_name", 1)],
+]
 
 # Инициализация подключения к MongoDB
 async def connect_to_mongo():
@@ -17,18 +32,27 @@ async def connect_to_mongo():
         if not mongodb_url:
             raise ValueError("Переменная окружения MONGODB_URL не установлена")
 
-        logger.info(f"Подключение к MongoDB")
+        settings = MongoSettings.from_env()
+        client_options = settings.client_options()
+        logger.info(f"Подключение к MongoDB с параметрами: {client_options}")
+        logger.info(f"Чтения списков и поиска: {settings.read_preference_mode()}")
 
-        MongoDB.client = AsyncIOMotorClient(mongodb_url)
+        MongoDB.settings = settings
+        MongoDB.client = AsyncIOMotorClient(
+            mongodb_url, event_listeners=[MongoCommandTracer()], **client_options
+        )
         MongoDB.database = MongoDB.client.filmix
+        MongoDB.read_database = MongoDB.client.get_database(
+            "filmix", read_preference=settings.read_preference_mode()
+        )
 
         # Проверяем подключение
         await MongoDB.client.admin.command('ping')
         logger.info("Успешно подключились к MongoDB")
 
-        # Проверяем количество документов в коллекции movies
-        count = await MongoDB.database.movie.count_documents({})
-        logger.info(f"Найдено {count} документов в коллекции movie")
+        # Оценка по метаданным коллекции, без полного подсчета документов
+        count = await MongoDB.database.movie.estimated_document_count()
+        logger.info(f"В коллекции movie примерно {count} документов")
 
     except ConnectionFailure as e:
         logger.error(f"Не удалось подключиться к MongoDB: {e}")
@@ -37,16 +61,44 @@ async def connect_to_mongo():
         logger.error(f"Ошибка при подключении к MongoDB: {e}")
         raise
 
+async def _create_indexes():
+    for keys in MOVIE_INDEXES:
+        try:
+            name = await MongoDB.database.movie.create_index(keys)
+            logger.info(f"Индекс {name} готов")
+        except Exception as e:
+            logger.error(f"Не удалось создать индекс {keys}: {e}")
+
+def start_index_creation():
+    """Создание индексов после старта; для уже существующих индексов это быстрая проверка"""
+    if MongoDB.database is not None and MongoDB.index_task is None:
+        MongoDB.index_task = asyncio.create_task(_create_indexes())
+
 async def close_mongo_connection():
+    if MongoDB.index_task is not None:
+        MongoDB.index_task.cancel()
+        try:
+            await MongoDB.index_task
+        except asyncio.CancelledError:
+            pass
+        MongoDB.index_task = None
     if MongoDB.client is not None:
         MongoDB.client.close()
         logger.info("Подключение к MongoDB закрыто")
 
-def get_database():
+async def ping_mongo(timeout: float = 2.0):
+    """Проверка доступности MongoDB для readiness-проверки"""
+    if MongoDB.client is None:
+        raise ConnectionFailure("Клиент MongoDB не инициализирован")
+    await asyncio.wait_for(MongoDB.client.admin.command("ping"), timeout)
+
+def get_database(for_read: bool = False):
+    """База данных; for_read=True — с read preference для чтений, допускающих отставание"""
     logger.debug("Запрос базы данных...")
     if MongoDB.database is None:
         logger.error("База данных не инициализирована! Вызовите connect_to_mongo() сначала")
         return None
 
-    logger.debug(f"Возвращаем базу данных: {MongoDB.database}")
-    return MongoDB.database
+    database = MongoDB.read_database if for_read else MongoDB.database
+    logger.debug(f"Возвращаем базу данных: {database}")
+    return database
@@ -0,0 +1,115 @@
+import importlib.util
+import os
+from typing import Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, Field, field_validator, model_validator
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred,
+)
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Модули, без которых драйвер молча отключает соответствующее сжатие
+COMPRESSOR_MODULES = {
+    "zstd": "zstandard",
+    "snappy": "snappy",
+    "zlib": "zlib",
+}
+
+
+class MongoSettings(BaseModel):
+    """Настройки клиента MongoDB, задаются переменными окружения MONGODB_*"""
+    max_pool_size: int = Field(100, ge=1)
+    min_pool_size: int = Field(0, ge=0)
+    max_idle_time_ms: Optional[int] = Field(None, gt=0)
+    connect_timeout_ms: int = Field(20000, gt=0)
+    server_selection_timeout_ms: int = Field(30000, gt=0)
+    socket_timeout_ms: Optional[int] = Field(None, gt=0)
+    compressors: List[Literal["zstd", "snappy", "zlib"]] = []
+    zlib_compression_level: int = Field(-1, ge=-1, le=9)
+    write_concern: Union[int, Literal["majority"]] = 1
+    write_journal: Optional[bool] = None
+    write_timeout_ms: Optional[int] = Field(None, gt=0)
+    # Куда направлять чтения списков, поиска и статистики; записи всегда идут на primary
+    read_preference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = "primary"
+    max_staleness_seconds: Optional[int] = Field(None, ge=90)
+
+    @field_validator("compressors", mode="before")
+    @classmethod
+    def split_compressors(cls, value):
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
+    @field_validator("write_concern", mode="before")
+    @classmethod
+    def parse_write_concern(cls, value):
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+        return value
+
+    @model_validator(mode="after")
+    def check_consistency(self):
+        if self.min_pool_size > self.max_pool_size:
+            raise ValueError("MONGODB_MIN_POOL_SIZE не может быть больше MONGODB_MAX_POOL_SIZE")
+        if self.read_preference == "primary" and self.max_staleness_seconds is not None:
+            raise ValueError("MONGODB_MAX_STALENESS_SECONDS нельзя использовать с read_preference=primary")
+        if self.write_concern == 0 and self.write_journal:
+            raise ValueError("MONGODB_WRITE_JOURNAL=true несовместим с MONGODB_WRITE_CONCERN=0")
+        # MovieService читает счетчики результатов записи, а при w=0 они недоступны
+        if isinstance(self.write_concern, int) and self.write_concern < 1:
+            raise ValueError("MONGODB_WRITE_CONCERN должен быть >= 1 или 'majority'")
+        # Без модуля драйвер молча отключает сжатие, поэтому такая настройка считается ошибкой
+        missing = [
+            compressor for compressor in self.compressors
+            if importlib.util.find_spec(COMPRESSOR_MODULES[compressor]) is None
+        ]
+        if missing:
+            modules = ", ".join(COMPRESSOR_MODULES[compressor] for compressor in missing)
+            raise ValueError(f"MONGODB_COMPRESSORS: не установлены модули {modules} (motor[snappy,zstd])")
+        return self
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        values = {}
+        for name in cls.model_fields:
+            value = os.getenv(f"MONGODB_{name.upper()}")
+            if value is not None and value != "":
+                values[name] = value
+        return cls(**values)
+
+    def client_options(self) -> Dict:
+        """Параметры для AsyncIOMotorClient"""
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "w": self.write_concern,
+        }
+        if self.max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.socket_timeout_ms is not None:
+            options["socketTimeoutMS"] = self.socket_timeout_ms
+        if self.write_journal is not None:
+            options["journal"] = self.write_journal
+        if self.write_timeout_ms is not None:
+            options["wTimeoutMS"] = self.write_timeout_ms
+
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+            if "zlib" in self.compressors:
+                options["zlibCompressionLevel"] = self.zlib_compression_level
+        return options
+
+    def read_preference_mode(self):
+        """Режим чтения для запросов, которым не нужна последняя запись"""
+        if self.read_preference == "primary":
+            return Primary()
+        max_staleness = self.max_staleness_seconds if self.max_staleness_seconds is not None else -1
+        return READ_PREFERENCES[self.read_preference](max_staleness=max_staleness)
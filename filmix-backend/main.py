@@ -1,12 +1,23 @@
+import time
+# Точка отсчета холодного старта: до импорта тяжелых зависимостей
+STARTED_AT = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 load_dotenv()
 
 from contextlib import asynccontextmanager
-from database.mongodb import connect_to_mongo, close_mongo_connection
-from routers import movies, series
+from database.mongodb import connect_to_mongo, close_mongo_connection, start_index_creation
+from routers import movies, series, autocomplete, recommendations, transfer, collections
+from services.autocomplete_service import autocomplete_service
+from services.collection_service import collection_service
+from services.health_service import health_service
+from services.refresh_service import refresh_service
+from services.tmdb_service import close_tmdb_service
 from fastapi.middleware.cors import CORSMiddleware
 from utils.logger import filmix_logger
+from utils.profiling import RequestTracingMiddleware
 import logging
 
 
@@ -25,10 +36,32 @@ async def lifespan(app: FastAPI):
         logger.error(f"Ошибка подключения к базе данных: {e}")
         raise
 
+    # Индексы MongoDB создаются в фоне и не задерживают старт
+    start_index_creation()
+
+    # Индекс автодополнения открывается через mmap и не требует сети
+    autocomplete_service.start()
+
+    # Сводки франшиз при первом запуске после их появления строятся в фоне
+    collection_service.start()
+
+    # Периодическое обновление рейтингов, постеров и жанров из TMDB
+    refresh_service.start()
+
+    # TMDB-клиент и матрица рекомендаций создаются лениво; при PREWARM_ON_STARTUP
+    # они прогреваются в фоне, не задерживая старт
+    health_service.start_prewarm()
+    health_service.mark_started(STARTED_AT)
+
     yield
 
     # Закрытие подключения при завершении
     logger.info("Завершение работы приложения")
+    await health_service.stop()
+    await refresh_service.stop()
+    await collection_service.stop()
+    await autocomplete_service.stop()
+    await close_tmdb_service()
     await close_mongo_connection()
 
 app = FastAPI(
@@ -47,9 +80,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ID запроса, журнал медленных запросов и профилирование по запросу
+app.add_middleware(RequestTracingMiddleware)
+
 # Подключение роутеров
 app.include_router(movies.router)
 app.include_router(series.router)
+app.include_router(autocomplete.router)
+app.include_router(recommendations.router)
+app.include_router(transfer.router)
+app.include_router(collections.router)
 
 @app.get("/")
 async def root():
@@ -60,6 +100,25 @@ async def root():
     }
 
 
+@app.get("/livez")
+async def liveness_check():
+    """Процесс жив и обрабатывает запросы; зависимости не проверяются"""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness_check():
+    """Готовность принимать трафик: доступность MongoDB (с коротким кэшем); без TMDB статус degraded"""
+    readiness = await health_service.readiness()
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse(readiness, status_code=status_code)
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    readiness = await health_service.readiness()
+    if not readiness["ready"]:
+        status = "unhealthy"
+    else:
+        status = "healthy" if readiness["status"] == "ready" else "degraded"
+    return JSONResponse({"status": status, "checks": readiness["checks"]}, status_code=200 if readiness["ready"] else 503)
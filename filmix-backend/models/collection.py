@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from models.movie import Movie
+
+class CollectionSummary(BaseModel):
+    """Сводка по франшизе (фильмам с одинаковым series_name)"""
+    series_name: str
+    member_count: int
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    avg_my_rating: Optional[float] = None
+    rated_count: int = 0
+    cover_poster_url: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "series_name": "Шрек",
+                "member_count": 4,
+                "year_from": 2001,
+                "year_to": 2010,
+                "avg_my_rating": 78.5,
+                "rated_count": 4,
+                "cover_poster_url": "https://image.tmdb.org/t/p/w500/iB64vpL3dIObOtMZgX3RqdVdQDc.jpg"
+            }
+        }
+
+class CollectionDetail(CollectionSummary):
+    """Франшиза со списком фильмов/сериалов по году выхода"""
+    members: List[Movie]
@@ -21,6 +21,7 @@ class MovieBase(BaseModel):
     description: Optional[str] = None
     poster_url: Optional[str] = None
     content_type: ContentType = ContentType.MOVIE
+    tmdb_id: Optional[int] = None  # ID в TMDB, если фильм добавлен оттуда
 
 class MovieCreate(MovieBase):
     """Модель для создания нового фильма/сериала"""
@@ -45,6 +46,7 @@ class MovieUpdate(BaseModel):
     description: Optional[str] = None
     poster_url: Optional[str] = None
     content_type: Optional[ContentType] = None
+    tmdb_id: Optional[int] = None
 
 class Movie(MovieBase):
     """Полная модель фильма/сериала с ID"""
@@ -67,6 +69,7 @@ class Movie(MovieBase):
                 "watch_date": "2024-01-15T00:00:00",
                 "description": "",
                 "poster_url": "https://image.tmdb.org/t/p/w500/fgpKUHugvbHir5Ia51vXKdCZd1F.jpg",
-                "content_type": "MOVIE"
+                "content_type": "MOVIE",
+                "tmdb_id": 1270613
             }
         }
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, Optional
+from models.movie import ContentType
+from services.autocomplete_service import autocomplete_service
+import logging
+
+# Создаем логгер для этого модуля
+logger = logging.getLogger("filmix.autocomplete_router")
+
+router = APIRouter(prefix="/api/autocomplete", tags=["autocomplete"])
+
+@router.get("/", response_model=Dict)
+async def autocomplete(
+    query: str = Query(..., min_length=1, description="Начало названия"),
+    content_type: Optional[ContentType] = Query(None, description="Тип контента"),
+    limit: int = Query(10, ge=1, le=20, description="Количество подсказок"),
+):
+    """Подсказки названий по локальному индексу экспортов TMDB"""
+    logger.debug(f"Автодополнение: {query}, content_type: {content_type}")
+    try:
+        results = autocomplete_service.search(query, content_type, limit)
+        return {"query": query, "results": results}
+    except Exception as e:
+        logger.error(f"Ошибка автодополнения: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка автодополнения: {str(e)}")
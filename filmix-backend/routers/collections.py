@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Literal
+from models.collection import CollectionSummary, CollectionDetail
+from services.collection_service import collection_service
+import logging
+
+# Создаем логгер для этого модуля
+logger = logging.getLogger("filmix.collections_router")
+
+router = APIRouter(prefix="/api/collections", tags=["collections"])
+
+@router.get("/", response_model=List[CollectionSummary])
+async def get_collections(
+    sort: Literal["name", "member_count", "avg_my_rating", "year"] = Query("name", description="Сортировка"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+):
+    """Получить франшизы со сводками"""
+    logger.info(f"Запрос франшиз, sort: {sort}")
+    try:
+        collections = await collection_service.get_summaries(sort, skip, limit)
+        logger.info(f"Успешно получено {len(collections)} франшиз")
+        return collections
+    except Exception as e:
+        logger.error(f"Ошибка при получении франшиз: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при получении франшиз: {str(e)}")
+
+@router.post("/refresh", response_model=Dict)
+async def refresh_collections():
+    """Пересчитать сводки всех франшиз"""
+    logger.info("Пересчет сводок франшиз")
+    try:
+        count = await collection_service.refresh_all()
+        return {"message": f"Сводки пересчитаны: {count}", "count": count}
+    except Exception as e:
+        logger.error(f"Ошибка при пересчете франшиз: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при пересчете франшиз: {str(e)}")
+
+# :path — в названии франшизы может быть "/" (например, "Fast & Furious / Форсаж")
+@router.get("/{series_name:path}", response_model=CollectionDetail)
+async def get_collection(series_name: str):
+    """Получить франшизу и ее фильмы"""
+    logger.info(f"Запрос франшизы: {series_name}")
+    try:
+        collection = await collection_service.get_collection(series_name)
+        if collection is None:
+            logger.warning(f"Франшиза {series_name} не найдена")
+            raise HTTPException(status_code=404, detail="Франшиза не найдена")
+        logger.info(f"Франшиза найдена: {len(collection.members)} фильмов")
+        return collection
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при получении франшизы {series_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
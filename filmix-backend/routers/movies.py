@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Dict
+from typing import List, Dict, Optional
 from models.movie import Movie, MovieCreate, MovieUpdate, MovieUpdateRating, ContentType
 from services.movie_service import movie_service
-from services.tmdb_service import tmdb_service
+from services.tmdb_service import get_tmdb_service
+from services.recommendation_service import recommendation_service
 import logging
 
 # Создаем логгер для этого модуля
@@ -39,6 +40,29 @@ async def get_movie(movie_id: str):
         logger.error(f"Ошибка при получении фильма {movie_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{movie_id}/similar", response_model=List[Movie])
+async def get_similar_movies(
+    movie_id: str,
+    limit: int = Query(10, ge=1, le=100, description="Количество рекомендаций"),
+    content_type: Optional[ContentType] = Query(None, description="Тип контента"),
+):
+    """Получить похожие фильмы/сериалы по жанрам, году, языку и оценкам"""
+    logger.info(f"Запрос похожих на {movie_id}")
+    try:
+        similar = await recommendation_service.similar(movie_id, limit, content_type)
+        if similar is None:
+            logger.warning(f"Фильм с ID {movie_id} не найден")
+            raise HTTPException(status_code=404, detail="Фильм не найден")
+
+        movies = await movie_service.get_movies_by_ids([similar_id for similar_id, _ in similar])
+        logger.info(f"Найдено {len(movies)} похожих фильмов")
+        return movies
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при поиске похожих фильмов {movie_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при поиске похожих фильмов: {str(e)}")
+
 @router.post("/", response_model=Movie)
 async def create_movie(movie: MovieCreate):
     """Создать новый фильм"""
@@ -56,6 +80,8 @@ async def search_movies(query: str = Query(..., description="Поисковый
     """Поиск фильмов в TMDB"""
     logger.info(f"Поиск фильмов в TMDB: {query}")
     try:
+        tmdb_service = get_tmdb_service()
+
         # Поиск в TMDB
         search_results = await tmdb_service.search_movies(query)
 
@@ -81,6 +107,8 @@ async def add_movie_from_tmdb(tmdb_id: int):
     """Добавить фильм из TMDB по ID"""
     logger.info(f"Добавление фильма из TMDB с ID: {tmdb_id}")
     try:
+        tmdb_service = get_tmdb_service()
+
         # Проверяем, не существует ли уже фильм с таким TMDB ID
         # (Пока пропускаем эту проверку, можно добавить позже)
 
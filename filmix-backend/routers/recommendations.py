@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from models.movie import Movie, ContentType
+from services.movie_service import movie_service
+from services.recommendation_service import recommendation_service
+import logging
+
+# Создаем логгер для этого модуля
+logger = logging.getLogger("filmix.recommendations_router")
+
+router = APIRouter(prefix="/api/recommendations", tags=["recommendations"])
+
+@router.get("/", response_model=List[Movie])
+async def get_recommendations(
+    limit: int = Query(10, ge=1, le=100, description="Количество рекомендаций"),
+    content_type: Optional[ContentType] = Query(None, description="Тип контента"),
+):
+    """Что посмотреть дальше: неоцененные фильмы, похожие на высоко оцененные"""
+    logger.info(f"Запрос рекомендаций, content_type: {content_type}")
+    try:
+        recommended = await recommendation_service.recommend(limit, content_type)
+        movies = await movie_service.get_movies_by_ids([movie_id for movie_id, _ in recommended])
+        logger.info(f"Подобрано {len(movies)} рекомендаций")
+        return movies
+    except Exception as e:
+        logger.error(f"Ошибка при подборе рекомендаций: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при подборе рекомендаций: {str(e)}")
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict
 from models.movie import Movie, MovieCreate, MovieUpdate, ContentType
 from services.movie_service import movie_service
-from services.tmdb_service import tmdb_service
+from services.tmdb_service import get_tmdb_service
 import logging
 
 # Создаем логгер для этого модуля
@@ -56,6 +56,8 @@ async def search_series(query: str = Query(..., description="Поисковый
     """Поиск сериалов в TMDB"""
     logger.info(f"Поиск сериалов в TMDB: {query}")
     try:
+        tmdb_service = get_tmdb_service()
+
         # Поиск в TMDB
         search_results = await tmdb_service.search_tv_shows(query)
 
@@ -81,6 +83,8 @@ async def add_series_from_tmdb(tmdb_id: int):
     """Добавить сериал из TMDB по ID"""
     logger.info(f"Добавление сериала из TMDB с ID: {tmdb_id}")
     try:
+        tmdb_service = get_tmdb_service()
+
         # Получаем детали сериала из TMDB
         tmdb_data = await tmdb_service.get_tv_details(tmdb_id)
 
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Optional
+from models.movie import ContentType
+from services.transfer_service import TransferFormat, export_movies, import_movies
+import logging
+
+# Создаем логгер для этого модуля
+logger = logging.getLogger("filmix.transfer_router")
+
+router = APIRouter(prefix="/api", tags=["transfer"])
+
+MEDIA_TYPES = {
+    TransferFormat.NDJSON: "application/x-ndjson",
+    TransferFormat.CSV: "text/csv; charset=utf-8",
+}
+
+@router.get("/export")
+async def export_library(
+    format: TransferFormat = Query(TransferFormat.NDJSON, description="Формат выгрузки"),
+    content_type: Optional[ContentType] = Query(None, description="Тип контента"),
+    gzip: bool = Query(False, description="Сжимать выгрузку gzip"),
+):
+    """Потоковая выгрузка библиотеки в NDJSON или CSV"""
+    logger.info(f"Выгрузка библиотеки: {format.value}, content_type: {content_type}, gzip: {gzip}")
+
+    filename = f"filmix.{format.value}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        media_type = "application/gzip"
+
+    return StreamingResponse(export_movies(format, content_type, gzip), media_type=media_type, headers=headers)
+
+@router.post("/import", response_model=Dict)
+async def import_library(
+    request: Request,
+    format: TransferFormat = Query(TransferFormat.NDJSON, description="Формат загружаемого файла"),
+):
+    """Загрузка библиотеки из NDJSON или CSV (можно gzip) с upsert по tmdb_id"""
+    logger.info(f"Загрузка библиотеки: {format.value}")
+    try:
+        # Тело запроса читается потоком, целиком в память не загружается
+        summary = await import_movies(request.stream(), format)
+        return summary
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке библиотеки: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при загрузке библиотеки: {str(e)}")
@@ -0,0 +1,366 @@
+import gzip
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import unicodedata
+from array import array
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger("filmix.autocomplete_index")
+
+# Формат файла индекса (little-endian):
+#   заголовок | key_offsets | keys | title_offsets | titles | ids | popularity
+#   | hot_offsets | hot_prefixes | hot_top
+# Записи отсортированы по нормализованному ключу (байты UTF-8), поэтому все
+# названия с общим префиксом лежат одним непрерывным диапазоном.
+MAGIC = b"FMXACIDX"
+VERSION = 1
+SECTIONS = (
+    "key_offsets", "keys", "title_offsets", "titles", "ids", "popularity",
+    "hot_offsets", "hot_prefixes", "hot_top",
+)
+HEADER = struct.Struct("<8sIIIId" + "QQ" * len(SECTIONS))
+
+# Диапазоны не длиннее SCAN_LIMIT ранжируются на лету, для более длинных
+# префиксов топ заранее вычисляется при построении индекса
+SCAN_LIMIT = 256
+HOT_TOP_K = 20
+MAX_KEY_CHARS = 64
+SPILL_CHUNK_SIZE = 200_000
+NO_ENTRY = 0xFFFFFFFF
+
+
+def normalize_title(title: str) -> str:
+    """Нормализация названия для префиксного поиска: без диакритики, регистра и лишних пробелов"""
+    decomposed = unicodedata.normalize("NFKD", title)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())[:MAX_KEY_CHARS]
+
+
+def iter_export_records(export_path: Path, min_popularity: float = 0.0) -> Iterator[Tuple[str, float, int, str]]:
+    """Потоковое чтение ежедневного экспорта TMDB (gzip NDJSON)"""
+    opener = gzip.open if str(export_path).endswith(".gz") else open
+    skipped = 0
+
+    with opener(export_path, "rt", encoding="utf-8") as export_file:
+        for line in export_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+
+            if item.get("adult"):
+                continue
+
+            title = item.get("original_title") or item.get("original_name")
+            tmdb_id = item.get("id")
+            popularity = float(item.get("popularity") or 0.0)
+            if not title or not isinstance(tmdb_id, int) or popularity < min_popularity:
+                continue
+
+            key = normalize_title(title)
+            if key:
+                yield key, popularity, tmdb_id, title
+
+    if skipped:
+        logger.warning(f"Пропущено {skipped} некорректных строк в {export_path}")
+
+
+def _sorted_records(records: Iterator[Tuple[str, float, int, str]], spill_dir: str) -> Iterator[Tuple[str, float, int, str]]:
+    """Внешняя сортировка: сортируем блоки фиксированного размера и сливаем их через heapq.merge"""
+    spill_paths = []
+    chunk = []
+
+    def spill():
+        chunk.sort(key=itemgetter(0))
+        fd, path = tempfile.mkstemp(suffix=".spill", dir=spill_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as spill_file:
+            for record in chunk:
+                spill_file.write(json.dumps(record, ensure_ascii=False))
+                spill_file.write("\n")
+        spill_paths.append(path)
+        chunk.clear()
+
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= SPILL_CHUNK_SIZE:
+            spill()
+
+    if not spill_paths:
+        chunk.sort(key=itemgetter(0))
+        yield from chunk
+        return
+
+    if chunk:
+        spill()
+
+    def read_spill(path):
+        with open(path, encoding="utf-8") as spill_file:
+            for line in spill_file:
+                yield tuple(json.loads(line))
+
+    try:
+        yield from heapq.merge(*(read_spill(path) for path in spill_paths), key=itemgetter(0))
+    finally:
+        for path in spill_paths:
+            os.unlink(path)
+
+
+class _Columns:
+    """Общий доступ к колонкам индекса (и при построении, и при чтении)"""
+
+    def __init__(self, key_offsets, keys, popularity):
+        self.key_offsets = key_offsets
+        self.keys = keys
+        self.popularity = popularity
+        self.size = len(popularity)
+
+    def key(self, i: int) -> bytes:
+        return bytes(self.keys[self.key_offsets[i]:self.key_offsets[i + 1]])
+
+    def key_len(self, i: int) -> int:
+        return self.key_offsets[i + 1] - self.key_offsets[i]
+
+    def lower_bound(self, prefix: bytes, lo: int = 0, hi: Optional[int] = None) -> int:
+        """Первая запись с ключом >= prefix"""
+        hi = self.size if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def upper_bound(self, prefix: bytes, lo: int = 0, hi: Optional[int] = None) -> int:
+        """Первая запись, ключ которой не начинается с prefix (при условии key(lo) >= prefix)"""
+        hi = self.size if hi is None else hi
+        width = len(prefix)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid)[:width] <= prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def top(self, lo: int, hi: int, limit: int) -> List[int]:
+        return heapq.nlargest(limit, range(lo, hi), key=self.popularity.__getitem__)
+
+
+def _collect_hot(columns: _Columns, prefix: bytes, lo: int, hi: int, hot: List[Tuple[bytes, List[int]]]) -> List[int]:
+    """Обходит префиксы с диапазоном длиннее SCAN_LIMIT и запоминает их топ по популярности"""
+    if hi - lo <= SCAN_LIMIT:
+        return columns.top(lo, hi, HOT_TOP_K)
+
+    depth = len(prefix)
+    i = lo
+    # Ключи, совпадающие с префиксом целиком, идут первыми
+    while i < hi and columns.key_len(i) == depth:
+        i += 1
+    candidates = columns.top(lo, i, HOT_TOP_K)
+
+    while i < hi:
+        child = prefix + columns.key(i)[depth:depth + 1]
+        j = columns.upper_bound(child, i, hi)
+        candidates.extend(_collect_hot(columns, child, i, j, hot))
+        i = j
+
+    best = heapq.nlargest(HOT_TOP_K, candidates, key=columns.popularity.__getitem__)
+    hot.append((prefix, best))
+    return best
+
+
+def _write_section(target, data) -> Tuple[int, int]:
+    # Выравниваем секции по 8 байт, чтобы memoryview.cast работал без копирования
+    padding = -target.tell() % 8
+    target.write(b"\0" * padding)
+    offset = target.tell()
+    if isinstance(data, (str, Path)):
+        with open(data, "rb") as source:
+            while block := source.read(1 << 20):
+                target.write(block)
+    else:
+        target.write(data)
+    return offset, target.tell() - offset
+
+
+def build_index(export_path: Path, index_path: Path, min_popularity: float = 0.0) -> int:
+    """Строит индекс из файла экспорта TMDB и атомарно заменяет index_path. Возвращает число записей."""
+    started = time.perf_counter()
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=index_path.parent) as work_dir:
+        key_offsets, title_offsets = array("I", [0]), array("I", [0])
+        ids, popularity = array("I"), array("f")
+        keys_path = os.path.join(work_dir, "keys")
+        titles_path = os.path.join(work_dir, "titles")
+
+        records = iter_export_records(export_path, min_popularity)
+        with open(keys_path, "wb") as keys_file, open(titles_path, "wb") as titles_file:
+            for key, record_popularity, tmdb_id, title in _sorted_records(records, work_dir):
+                key_bytes = key.encode("utf-8")
+                title_bytes = title.encode("utf-8")
+                keys_file.write(key_bytes)
+                titles_file.write(title_bytes)
+                key_offsets.append(key_offsets[-1] + len(key_bytes))
+                title_offsets.append(title_offsets[-1] + len(title_bytes))
+                ids.append(tmdb_id)
+                popularity.append(record_popularity)
+
+        hot: List[Tuple[bytes, List[int]]] = []
+        if len(ids) and key_offsets[-1]:
+            with open(keys_path, "rb") as keys_file:
+                with mmap.mmap(keys_file.fileno(), 0, access=mmap.ACCESS_READ) as keys_map:
+                    _collect_hot(_Columns(key_offsets, keys_map, popularity), b"", 0, len(ids), hot)
+        hot.sort(key=itemgetter(0))
+
+        hot_offsets = array("I", [0])
+        hot_prefixes = bytearray()
+        hot_top = array("I")
+        for prefix, best in hot:
+            hot_prefixes += prefix
+            hot_offsets.append(len(hot_prefixes))
+            hot_top.extend(best + [NO_ENTRY] * (HOT_TOP_K - len(best)))
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".idx", dir=index_path.parent)
+        try:
+            with os.fdopen(fd, "wb") as index_file:
+                index_file.write(b"\0" * HEADER.size)
+                sections = [
+                    _write_section(index_file, key_offsets.tobytes()),
+                    _write_section(index_file, keys_path),
+                    _write_section(index_file, title_offsets.tobytes()),
+                    _write_section(index_file, titles_path),
+                    _write_section(index_file, ids.tobytes()),
+                    _write_section(index_file, popularity.tobytes()),
+                    _write_section(index_file, hot_offsets.tobytes()),
+                    _write_section(index_file, bytes(hot_prefixes)),
+                    _write_section(index_file, hot_top.tobytes()),
+                ]
+                index_file.seek(0)
+                index_file.write(HEADER.pack(
+                    MAGIC, VERSION, len(ids), len(hot), HOT_TOP_K, time.time(),
+                    *(value for section in sections for value in section),
+                ))
+                index_file.flush()
+                os.fsync(index_file.fileno())
+            os.replace(tmp_path, index_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    logger.info(
+        f"Индекс автодополнения {index_path} построен: {len(ids)} записей, "
+        f"{len(hot)} горячих префиксов за {time.perf_counter() - started:.1f} с"
+    )
+    return len(ids)
+
+
+class AutocompleteIndex:
+    """Отсортированный префиксный индекс, открытый через mmap (только чтение)"""
+
+    def __init__(self, index_path: Path):
+        self.path = Path(index_path)
+        self._file = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        header = HEADER.unpack_from(self._map, 0)
+        magic, version, self.size, self.hot_size, self.hot_top_k, self.built_at = header[:6]
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Файл {self.path} не является индексом автодополнения версии {VERSION}")
+
+        self._view = view = memoryview(self._map)
+        spans = header[6:]
+        section = {
+            name: view[spans[2 * i]:spans[2 * i] + spans[2 * i + 1]]
+            for i, name in enumerate(SECTIONS)
+        }
+        self._views = list(section.values())
+        self._columns = _Columns(
+            section["key_offsets"].cast("I"), section["keys"], section["popularity"].cast("f")
+        )
+        self._title_offsets = section["title_offsets"].cast("I")
+        self._titles = section["titles"]
+        self._ids = section["ids"].cast("I")
+        self._hot = _Columns(section["hot_offsets"].cast("I"), section["hot_prefixes"], range(self.hot_size))
+        self._hot_top = section["hot_top"].cast("I")
+        self._views += [
+            self._columns.key_offsets, self._columns.popularity, self._title_offsets,
+            self._ids, self._hot.key_offsets, self._hot_top,
+        ]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _entry(self, i: int) -> Dict:
+        title = bytes(self._titles[self._title_offsets[i]:self._title_offsets[i + 1]]).decode("utf-8")
+        return {
+            "tmdb_id": self._ids[i],
+            "title": title,
+            "popularity": round(self._columns.popularity[i], 3),
+        }
+
+    def _hot_lookup(self, prefix: bytes) -> List[int]:
+        position = self._hot.lower_bound(prefix)
+        if position < self.hot_size and self._hot.key(position) == prefix:
+            start = position * self.hot_top_k
+            return [i for i in self._hot_top[start:start + self.hot_top_k] if i != NO_ENTRY]
+        return []
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Названия, начинающиеся с query, по убыванию популярности"""
+        prefix = normalize_title(query).encode("utf-8")
+        if not prefix or not self.size:
+            return []
+
+        lo = self._columns.lower_bound(prefix)
+        hi = self._columns.upper_bound(prefix, lo)
+        if hi - lo <= SCAN_LIMIT:
+            best = self._columns.top(lo, hi, limit)
+        else:
+            best = self._hot_lookup(prefix)[:limit]
+
+        return [self._entry(i) for i in best]
+
+    def close(self):
+        # Срезы memoryview держат mmap, их нужно освободить до закрытия
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Построение индекса автодополнения из экспорта TMDB")
+    parser.add_argument("export", type=Path, help="Файл экспорта TMDB (*.json.gz)")
+    parser.add_argument("index", type=Path, help="Путь к файлу индекса")
+    parser.add_argument("--min-popularity", type=float, default=0.0)
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_index(arguments.export, arguments.index, arguments.min_popularity)
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import httpx
+import logging
+from models.movie import ContentType
+from services.autocomplete_index import AutocompleteIndex, build_index
+
+logger = logging.getLogger("filmix.autocomplete_service")
+
+# Имена файлов ежедневных экспортов TMDB: movie_ids_MM_DD_YYYY.json.gz
+EXPORT_PREFIXES = {
+    ContentType.MOVIE: "movie_ids",
+    ContentType.SERIES: "tv_series_ids",
+}
+
+
+class AutocompleteService:
+    def __init__(self):
+        self.index_dir = Path(os.getenv("AUTOCOMPLETE_INDEX_DIR", "data/autocomplete"))
+        self.exports_url = os.getenv("TMDB_EXPORTS_URL", "http://files.tmdb.org/p/exports")
+        self.refresh_hours = float(os.getenv("AUTOCOMPLETE_REFRESH_HOURS", "0"))
+        self.min_popularity = float(os.getenv("AUTOCOMPLETE_MIN_POPULARITY", "0"))
+
+        self.indexes: Dict[ContentType, AutocompleteIndex] = {}
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Время последней попытки обновления: неудачная попытка не повторяется раньше refresh_hours
+        self._attempted_at: Dict[ContentType, float] = {}
+        logger.info("AutocompleteService инициализирован")
+
+    def index_path(self, content_type: ContentType) -> Path:
+        return self.index_dir / f"{content_type.value.lower()}.idx"
+
+    def load(self):
+        """Открывает уже построенные индексы с диска"""
+        for content_type in EXPORT_PREFIXES:
+            path = self.index_path(content_type)
+            if not path.exists():
+                logger.warning(f"Индекс автодополнения {path} не найден, автодополнение для {content_type.value} недоступно")
+                continue
+            try:
+                self._swap(content_type, AutocompleteIndex(path))
+            except Exception as e:
+                logger.error(f"Не удалось открыть индекс автодополнения {path}: {e}")
+
+    def _swap(self, content_type: ContentType, index: AutocompleteIndex):
+        # Поиск синхронный и выполняется в цикле событий, поэтому замена ссылки атомарна
+        previous = self.indexes.get(content_type)
+        self.indexes[content_type] = index
+        if previous is not None:
+            previous.close()
+        logger.info(f"Индекс автодополнения {content_type.value} загружен: {len(index)} записей")
+
+    def search(self, query: str, content_type: Optional[ContentType] = None, limit: int = 10) -> List[Dict]:
+        """Поиск названий по префиксу без обращения к сети"""
+        content_types = [content_type] if content_type else list(EXPORT_PREFIXES)
+        results = []
+
+        for current_type in content_types:
+            index = self.indexes.get(current_type)
+            if index is None:
+                continue
+            for item in index.search(query, limit):
+                item["content_type"] = current_type.value
+                results.append(item)
+
+        if len(content_types) > 1:
+            results.sort(key=lambda item: item["popularity"], reverse=True)
+        return results[:limit]
+
+    async def _download_export(self, content_type: ContentType, target: Path):
+        # Экспорт за сегодня появляется не сразу, поэтому берем вчерашний
+        export_date = datetime.now(timezone.utc) - timedelta(days=1)
+        url = f"{self.exports_url}/{EXPORT_PREFIXES[content_type]}_{export_date:%m_%d_%Y}.json.gz"
+        logger.info(f"Загрузка экспорта TMDB: {url}")
+
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=300.0)) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                with open(target, "wb") as export_file:
+                    async for chunk in response.aiter_bytes(1 << 20):
+                        export_file.write(chunk)
+
+    async def rebuild(self, content_type: ContentType, export_path: Path):
+        """Строит индекс из файла экспорта в отдельном потоке и подменяет текущий"""
+        path = self.index_path(content_type)
+        await asyncio.to_thread(build_index, export_path, path, self.min_popularity)
+        index = await asyncio.to_thread(AutocompleteIndex, path)
+        self._swap(content_type, index)
+
+    def _refresh_delay(self, content_type: ContentType) -> float:
+        """Секунды до обновления индекса: считаются от его построения (built_at) или последней попытки"""
+        index = self.indexes.get(content_type)
+        updated_at = max(index.built_at if index is not None else 0.0, self._attempted_at.get(content_type, 0.0))
+        return max(updated_at + self.refresh_hours * 3600 - time.time(), 0.0)
+
+    async def refresh(self, content_types: Optional[List[ContentType]] = None):
+        """Скачивает свежие экспорты TMDB и перестраивает индексы"""
+        async with self._refresh_lock:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            for content_type in content_types or list(EXPORT_PREFIXES):
+                self._attempted_at[content_type] = time.time()
+                with tempfile.TemporaryDirectory(dir=self.index_dir) as work_dir:
+                    export_path = Path(work_dir) / "export.json.gz"
+                    try:
+                        await self._download_export(content_type, export_path)
+                        await self.rebuild(content_type, export_path)
+                    except Exception as e:
+                        logger.error(f"Ошибка при обновлении индекса автодополнения {content_type.value}: {e}")
+
+    async def _refresh_loop(self):
+        # Индекс, построенный недавно (например, до перезапуска), не перестраивается при старте:
+        # построение нагружает CPU и конкурирует с обработкой запросов за GIL
+        while True:
+            delay = min(self._refresh_delay(content_type) for content_type in EXPORT_PREFIXES)
+            if delay > 0:
+                logger.info(f"Следующее обновление автодополнения через {delay / 3600:.1f} ч")
+                await asyncio.sleep(delay)
+            stale = [content_type for content_type in EXPORT_PREFIXES if self._refresh_delay(content_type) == 0]
+            await self.refresh(stale)
+
+    def start(self):
+        """Загружает индексы и запускает фоновое обновление, если оно включено"""
+        self.load()
+        if self.refresh_hours > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+            logger.info(f"Фоновое обновление автодополнения каждые {self.refresh_hours} ч")
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+        for index in self.indexes.values():
+            index.close()
+        self.indexes.clear()
+
+
+# Создаем экземпляр сервиса
+autocomplete_service = AutocompleteService()
@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import logging
+from models.collection import CollectionSummary, CollectionDetail
+from models.movie import Movie
+from database.mongodb import get_database
+
+logger = logging.getLogger("filmix.collection_service")
+
+# Поля фильма, от которых зависит сводка франшизы
+SUMMARY_FIELDS = {"series_name", "year", "my_rating", "poster_url"}
+
+SORT_FIELDS = {
+    "name": ("_id", 1),
+    "member_count": ("member_count", -1),
+    "avg_my_rating": ("avg_my_rating", -1),
+    "year": ("year_from", 1),
+}
+
+
+def _summary_pipeline(match: Dict) -> List[Dict]:
+    return [
+        {"$match": match},
+        {"$sort": {"year": 1}},
+        {"$group": {
+            "_id": "$series_name",
+            "member_count": {"$sum": 1},
+            "year_from": {"$min": "$year"},
+            "year_to": {"$max": "$year"},
+            "avg_my_rating": {"$avg": "$my_rating"},
+            "rated_count": {"$sum": {"$cond": [{"$gt": ["$my_rating", None]}, 1, 0]}},
+            "posters": {"$push": "$poster_url"},
+        }},
+        {"$project": {
+            "member_count": 1,
+            "year_from": 1,
+            "year_to": 1,
+            "avg_my_rating": {"$round": ["$avg_my_rating", 1]},
+            "rated_count": 1,
+            # Обложка — постер самого раннего фильма, у которого он есть
+            "cover_poster_url": {"$first": {"$filter": {"input": "$posters", "cond": {"$gt": ["$$this", None]}}}},
+            "refreshed_at": "$$NOW",
+        }},
+    ]
+
+
+class CollectionService:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        logger.info("CollectionService инициализирован")
+
+    def _database(self, for_read: bool = False):
+        db = get_database(for_read=for_read)
+        if db is None:
+            logger.error("База данных None! Проблема с подключением")
+            raise Exception("Не удалось получить базу данных")
+        return db
+
+    async def refresh_groups(self, series_names: Iterable[Optional[str]]):
+        """Пересчитывает сводки только для указанных франшиз (по индексу series_name)"""
+        names = sorted({name for name in series_names if name})
+        if not names:
+            return
+
+        db = self._database()
+        summaries = await db.movie.aggregate(_summary_pipeline({"series_name": {"$in": names}})).to_list(None)
+        for summary in summaries:
+            await db.franchise.replace_one({"_id": summary["_id"]}, summary, upsert=True)
+
+        # Франшизы, в которых не осталось фильмов, удаляем
+        empty = set(names) - {summary["_id"] for summary in summaries}
+        if empty:
+            await db.franchise.delete_many({"_id": {"$in": list(empty)}})
+
+        logger.debug(f"Сводки франшиз обновлены: {names}")
+
+    async def on_movies_changed(self, series_names: Iterable[Optional[str]]):
+        """Вызывается из MovieService после записи; ошибка не должна ломать саму запись"""
+        try:
+            await self.refresh_groups(series_names)
+        except Exception as e:
+            logger.error(f"Не удалось обновить сводки франшиз {list(series_names)}: {e}")
+
+    async def refresh_all(self) -> int:
+        """Полная материализация сводок одной агрегацией с $merge"""
+        db = self._database()
+        started = datetime.now()
+
+        pipeline = _summary_pipeline({"series_name": {"$nin": [None, ""]}})
+        pipeline.append({"$merge": {"into": "franchise", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}})
+        await db.movie.aggregate(pipeline).to_list(None)
+
+        # Удаляем сводки франшиз, у которых больше нет фильмов
+        names = await db.movie.distinct("series_name")
+        await db.franchise.delete_many({"_id": {"$nin": names}})
+        count = await db.franchise.count_documents({})
+
+        elapsed = (datetime.now() - started).total_seconds()
+        logger.info(f"Сводки франшиз пересчитаны: {count} за {elapsed:.2f} с")
+        return count
+
+    async def _initial_refresh(self):
+        try:
+            db = self._database()
+            if await db.franchise.estimated_document_count() > 0:
+                return
+            if await db.movie.find_one({"series_name": {"$nin": [None, ""]}}, {"_id": 1}) is None:
+                return
+
+            logger.info("Сводки франшиз отсутствуют, строим их в фоне")
+            await self.refresh_all()
+        except Exception as e:
+            logger.error(f"Не удалось построить сводки франшиз при старте: {e}")
+
+    def start(self):
+        """Строит сводки в фоне, если коллекция franchise пуста (первый запуск после обновления)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._initial_refresh())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get_summaries(self, sort: str = "name", skip: int = 0, limit: int = 100) -> List[CollectionSummary]:
+        """Список франшиз — одно чтение из материализованной коллекции"""
+        sort_field, direction = SORT_FIELDS[sort]
+        cursor = self._database(for_read=True).franchise.find({}).sort([(sort_field, direction), ("_id", 1)]).skip(skip).limit(limit)
+
+        summaries = []
+        async for summary in cursor:
+            summary["series_name"] = summary.pop("_id")
+            summaries.append(CollectionSummary(**summary))
+        return summaries
+
+    async def get_collection(self, series_name: str) -> Optional[CollectionDetail]:
+        """Сводка франшизы и ее фильмы по году выхода"""
+        db = self._database(for_read=True)
+        summary = await db.franchise.find_one({"_id": series_name})
+        if summary is None:
+            return None
+
+        members = []
+        async for movie_doc in db.movie.find({"series_name": series_name}).sort("year", 1):
+            movie_doc["_id"] = str(movie_doc["_id"])
+            members.append(Movie(**movie_doc))
+
+        summary["series_name"] = summary.pop("_id")
+        return CollectionDetail(**summary, members=members)
+
+
+# Создаем экземпляр сервиса
+collection_service = CollectionService()
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+import httpx
+import logging
+from database.mongodb import ping_mongo
+from services.tmdb_service import get_tmdb_service
+from services.recommendation_service import recommendation_service
+
+logger = logging.getLogger("filmix.health_service")
+
+
+def _public_error(error: Exception) -> str:
+    """Описание ошибки для ответа пробы: без текста исключения, в URL TMDB есть api_key"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return type(error).__name__
+
+
+def _log_error(error: Exception) -> str:
+    """Описание ошибки для журнала: URL запроса без строки параметров"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code} {error.request.url.copy_with(query=None)}"
+    if isinstance(error, httpx.RequestError):
+        try:
+            return f"{type(error).__name__} {error.request.url.copy_with(query=None)}"
+        except RuntimeError:
+            # Запрос не был привязан к исключению
+            return type(error).__name__
+    return str(error) or type(error).__name__
+
+
+class HealthService:
+    def __init__(self):
+        self.cache_seconds = float(os.getenv("READINESS_CACHE_SECONDS", "5"))
+        self.check_timeout = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+        self.prewarm_enabled = os.getenv("PREWARM_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+        self.startup_seconds: Optional[float] = None
+        self.prewarm_seconds: Optional[float] = None
+        self.prewarm_task: Optional[asyncio.Task] = None
+
+        self._cached: Optional[Dict] = None
+        self._cached_at = 0.0
+        self._lock = asyncio.Lock()
+        logger.info("HealthService инициализирован")
+
+    def mark_started(self, started_at: float):
+        """Фиксирует время холодного старта от импорта приложения до готовности принимать запросы"""
+        self.startup_seconds = time.perf_counter() - started_at
+        logger.info(f"Холодный старт занял {self.startup_seconds:.3f} с")
+
+    async def _tmdb_probe(self):
+        # Создание сервиса тоже может упасть (нет ключа), это тоже ошибка проверки TMDB
+        await get_tmdb_service().ping(self.check_timeout)
+
+    async def _prewarm(self):
+        started = time.perf_counter()
+        steps = {
+            "mongo": ping_mongo(self.check_timeout),
+            "tmdb": self._tmdb_probe(),
+            "recommendations": recommendation_service.ensure_built(),
+        }
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        for name, result in zip(steps, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Прогрев {name} не удался: {_log_error(result)}")
+
+        self.prewarm_seconds = time.perf_counter() - started
+        logger.info(f"Прогрев завершен за {self.prewarm_seconds:.3f} с")
+
+    def start_prewarm(self):
+        """Прогрев кэшей и пулов соединений в фоне; пока он идет, readiness отвечает 503"""
+        if self.prewarm_enabled and self.prewarm_task is None:
+            self.prewarm_task = asyncio.create_task(self._prewarm())
+
+    async def stop(self):
+        if self.prewarm_task is not None and not self.prewarm_task.done():
+            self.prewarm_task.cancel()
+            try:
+                await self.prewarm_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _check(self, name: str, probe) -> Dict:
+        started = time.perf_counter()
+        try:
+            await probe
+            status = {"status": "ok"}
+        except Exception as e:
+            logger.warning(f"Проверка {name} не пройдена: {_log_error(e)}")
+            status = {"status": "error", "error": _public_error(e)}
+        status["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return status
+
+    async def readiness(self) -> Dict:
+        """Состояние зависимостей; результат кэшируется, чтобы частые пробы были дешевыми"""
+        if self._cached is not None and time.monotonic() - self._cached_at < self.cache_seconds:
+            return self._cached
+
+        async with self._lock:
+            # Параллельные пробы ждут одну проверку вместо запуска своих
+            if self._cached is not None and time.monotonic() - self._cached_at < self.cache_seconds:
+                return self._cached
+
+            mongo, tmdb = await asyncio.gather(
+                self._check("mongo", ping_mongo(self.check_timeout)),
+                self._check("tmdb", self._tmdb_probe()),
+            )
+            warming = self.prewarm_task is not None and not self.prewarm_task.done()
+            # Библиотека, франшизы и рекомендации работают без TMDB, поэтому его недоступность
+            # не выводит реплику из балансировки, а только отмечается как degraded
+            ready = not warming and mongo["status"] == "ok"
+            if not ready:
+                status = "warming" if warming else "not_ready"
+            else:
+                status = "ready" if tmdb["status"] == "ok" else "degraded"
+
+            result = {
+                "status": status,
+                "ready": ready,
+                "checks": {"mongo": mongo, "tmdb": tmdb},
+                "startup_seconds": self.startup_seconds,
+                "prewarm_seconds": self.prewarm_seconds,
+            }
+            # Во время прогрева не кэшируем, чтобы не задерживать переход в ready
+            if not warming:
+                self._cached = result
+                self._cached_at = time.monotonic()
+            return result
+
+
+# Создаем экземпляр сервиса
+health_service = HealthService()
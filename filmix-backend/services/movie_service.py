@@ -1,8 +1,11 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
 from motor.motor_asyncio import AsyncIOMotorCollection
 from models.movie import Movie, MovieCreate, MovieUpdate, ContentType
 from database.mongodb import get_database
+from services.recommendation_service import recommendation_service, FEATURE_FIELDS
+from services.collection_service import collection_service, SUMMARY_FIELDS
 import logging
 
 # Создаем логгер для этого модуля
@@ -12,6 +15,7 @@ logger = logging.getLogger("filmix.movie_service")
 class MovieService:
     def __init__(self):
         self.collection: AsyncIOMotorCollection = None
+        self.read_collection: AsyncIOMotorCollection = None
         logger.info("MovieService инициализирован")
 
     def get_collection(self) -> AsyncIOMotorCollection:
@@ -29,6 +33,18 @@ class MovieService:
 
         return self.collection
 
+    def get_read_collection(self) -> AsyncIOMotorCollection:
+        """Коллекция для списков и поиска: может читать с secondary. Записи и чтение после записи — через get_collection"""
+        if self.read_collection is None:
+            db = get_database(for_read=True)
+            if db is None:
+                logger.error("База данных None! Проблема с подключением")
+                raise Exception("Не удалось получить базу данных")
+
+            self.read_collection = db.movie
+
+        return self.read_collection
+
     async def create_movie(self, movie_data: MovieCreate) -> Movie:
         """Создание нового фильма/сериала"""
         collection = self.get_collection()
@@ -37,13 +53,84 @@ class MovieService:
         result = await collection.insert_one(movie_dict)
         movie_dict["_id"] = str(result.inserted_id)
 
-        return Movie(**movie_dict)
+        movie = Movie(**movie_dict)
+        recommendation_service.on_movie_saved(movie)
+        await collection_service.on_movies_changed([movie.series_name])
+        return movie
+
+    async def bulk_upsert_movies(self, movies: List[Tuple[Optional[str], MovieCreate]]) -> Tuple[int, int]:
+        """Пакетная запись [(id, фильм)]: upsert по _id, если id валиден, иначе по tmdb_id и типу контента,
+        иначе вставка. Возвращает (создано, обновлено)
+
+        При частичной ошибке пробрасывается BulkWriteError, успешные операции остаются записанными.
+        Сводки франшиз здесь не пересчитываются: upsert может сменить series_name, прежнее значение
+        неизвестно, поэтому после загрузки вызывающий код пересчитывает их целиком
+        """
+        if not movies:
+            return 0, 0
+
+        collection = self.get_collection()
+        operations = []
+        for movie_id, movie in movies:
+            movie_dict = movie.model_dump()
+            if movie_id and ObjectId.is_valid(movie_id):
+                operations.append(UpdateOne({"_id": ObjectId(movie_id)}, {"$set": movie_dict}, upsert=True))
+            elif movie.tmdb_id is not None:
+                operations.append(UpdateOne(
+                    {"tmdb_id": movie.tmdb_id, "content_type": movie_dict["content_type"]},
+                    {"$set": movie_dict},
+                    upsert=True
+                ))
+            else:
+                operations.append(InsertOne(movie_dict))
+
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+        finally:
+            # Даже при частичной ошибке часть строк записана.
+            # Инкрементально обновлять матрицу для тысяч строк дороже, чем перестроить ее
+            recommendation_service.invalidate()
+
+        logger.info(f"Пакетная запись: создано {result.inserted_count + result.upserted_count}, обновлено {result.matched_count}")
+        return result.inserted_count + result.upserted_count, result.matched_count
+
+    async def bulk_update_fields(self, updates: List[Tuple[str, dict]]) -> int:
+        """Пакетное обновление отдельных полей: [(id, {поле: значение})]. Возвращает число измененных"""
+        operations = [
+            UpdateOne({"_id": ObjectId(movie_id)}, {"$set": fields})
+            for movie_id, fields in updates
+            if fields and ObjectId.is_valid(movie_id)
+        ]
+        if not operations:
+            return 0
+
+        collection = self.get_collection()
+        result = await collection.bulk_write(operations, ordered=False)
+        if result.modified_count:
+            feature_ids = [
+                ObjectId(movie_id) for movie_id, fields in updates
+                if FEATURE_FIELDS.keys() & fields.keys() and ObjectId.is_valid(movie_id)
+            ]
+            if feature_ids:
+                docs = await collection.find({"_id": {"$in": feature_ids}}, FEATURE_FIELDS).to_list(None)
+                recommendation_service.on_documents_changed(docs)
+
+            changed_ids = [
+                ObjectId(movie_id) for movie_id, fields in updates
+                if SUMMARY_FIELDS & fields.keys() and ObjectId.is_valid(movie_id)
+            ]
+            if changed_ids:
+                series_names = await collection.distinct("series_name", {"_id": {"$in": changed_ids}})
+                await collection_service.on_movies_changed(series_names)
+
+        logger.info(f"Пакетное обновление полей: изменено {result.modified_count} из {len(operations)}")
+        return result.modified_count
 
     async def get_all_movies(self, content_type: Optional[ContentType] = None) -> List[Movie]:
         """Получение всех фильмов или сериалов"""
         logger.info(f"Запрос всех фильмов, content_type: {content_type}")
 
-        collection = self.get_collection()
+        collection = self.get_read_collection()
         logger.info(f"Коллекция получена: {collection}")
 
         query = {}
@@ -82,6 +169,21 @@ class MovieService:
 
         return None
 
+    async def get_movies_by_ids(self, movie_ids: List[str]) -> List[Movie]:
+        """Получение фильмов по списку ID с сохранением порядка"""
+        collection = self.get_read_collection()
+
+        object_ids = [ObjectId(movie_id) for movie_id in movie_ids if ObjectId.is_valid(movie_id)]
+        if not object_ids:
+            return []
+
+        found = {}
+        async for movie_doc in collection.find({"_id": {"$in": object_ids}}):
+            movie_doc["_id"] = str(movie_doc["_id"])
+            found[movie_doc["_id"]] = Movie(**movie_doc)
+
+        return [found[movie_id] for movie_id in movie_ids if movie_id in found]
+
     async def update_movie(self, movie_id: str, movie_update: MovieUpdate) -> Optional[Movie]:
         """Обновление фильма"""
         collection = self.get_collection()
@@ -94,13 +196,24 @@ class MovieService:
         if not update_data:
             return await self.get_movie_by_id(movie_id)
 
+        # Прежняя франшиза нужна, чтобы пересчитать и ее сводку
+        previous_series_name = None
+        if "series_name" in update_data:
+            previous = await collection.find_one({"_id": ObjectId(movie_id)}, {"series_name": 1})
+            previous_series_name = previous.get("series_name") if previous else None
+
         result = await collection.update_one(
             {"_id": ObjectId(movie_id)},
             {"$set": update_data}
         )
 
         if result.modified_count > 0:
-            return await self.get_movie_by_id(movie_id)
+            movie = await self.get_movie_by_id(movie_id)
+            if movie:
+                recommendation_service.on_movie_saved(movie)
+                if SUMMARY_FIELDS & update_data.keys():
+                    await collection_service.on_movies_changed([previous_series_name, movie.series_name])
+            return movie
 
         return None
 
@@ -113,10 +226,12 @@ class MovieService:
             logger.warning(f"Невалидный ID фильма: {movie_id}")
             return False
 
-        result = await collection.delete_one({"_id": ObjectId(movie_id)})
-        
-        if result.deleted_count > 0:
+        deleted = await collection.find_one_and_delete({"_id": ObjectId(movie_id)}, {"series_name": 1})
+
+        if deleted is not None:
             logger.info(f"Фильм с ID {movie_id} успешно удален")
+            recommendation_service.on_movie_deleted(movie_id)
+            await collection_service.on_movies_changed([deleted.get("series_name")])
             return True
         else:
             logger.warning(f"Фильм с ID {movie_id} не найден для удаления")
@@ -143,7 +258,11 @@ class MovieService:
 
         if result.modified_count > 0:
             logger.info(f"Рейтинг фильма {movie_id} успешно обновлен")
-            return await self.get_movie_by_id(movie_id)
+            movie = await self.get_movie_by_id(movie_id)
+            if movie:
+                recommendation_service.on_movie_saved(movie)
+                await collection_service.on_movies_changed([movie.series_name])
+            return movie
         else:
             logger.warning(f"Фильм с ID {movie_id} не найден для обновления рейтинга")
             return None
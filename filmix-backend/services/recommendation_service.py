@@ -0,0 +1,267 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import logging
+from models.movie import Movie, ContentType
+from database.mongodb import get_database
+
+logger = logging.getLogger("filmix.recommendation_service")
+
+# Веса групп признаков в векторе фильма
+GENRE_WEIGHT = 1.0
+LANGUAGE_WEIGHT = 0.5
+YEAR_WEIGHT = 0.5
+RATING_WEIGHT = 0.3
+MY_RATING_WEIGHT = 0.3
+
+# Числовые признаки занимают первые колонки, дальше по мере появления
+# добавляются колонки жанров и языков
+NUMERIC_COLUMNS = 3
+MIN_YEAR = 1900
+BATCH_ROWS = 65536
+# Оценка, начиная с которой фильм считается понравившимся
+LIKED_RATING = 70
+
+FEATURE_FIELDS = {
+    "genres": 1, "year": 1, "original_language": 1, "rating": 1,
+    "my_rating": 1, "content_type": 1,
+}
+
+
+class RecommendationService:
+    def __init__(self):
+        self._reset()
+        self._built = False
+        # Увеличивается при каждом invalidate(), чтобы сброс во время построения не потерялся
+        self._generation = 0
+        self._build_lock = asyncio.Lock()
+        self._pending: Optional[List[Tuple[str, Optional[Dict]]]] = None
+        logger.info("RecommendationService инициализирован")
+
+    def _reset(self):
+        self._vocabulary: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((0, NUMERIC_COLUMNS), dtype=np.float32)
+        self._series = np.zeros(0, dtype=bool)
+        self._my_ratings = np.zeros(0, dtype=np.float32)
+        self._max_year = datetime.now().year + 1
+
+    @property
+    def size(self) -> int:
+        return len(self._ids)
+
+    def _column(self, feature: str) -> int:
+        column = self._vocabulary.get(feature)
+        if column is None:
+            column = NUMERIC_COLUMNS + len(self._vocabulary)
+            self._vocabulary[feature] = column
+            if column >= self._vectors.shape[1]:
+                # Новые колонки нулевые, поэтому нормы существующих строк не меняются
+                grown = np.zeros((self._vectors.shape[0], max(2 * self._vectors.shape[1], 16)), dtype=np.float32)
+                grown[:, :self._vectors.shape[1]] = self._vectors
+                self._vectors = grown
+        return column
+
+    def _encode(self, doc: Dict) -> Dict[int, float]:
+        features = {}
+
+        year = doc.get("year")
+        if year:
+            features[0] = YEAR_WEIGHT * min(max((year - MIN_YEAR) / (self._max_year - MIN_YEAR), 0.0), 1.0)
+        if doc.get("rating"):
+            features[1] = RATING_WEIGHT * min(doc["rating"] / 10, 1.0)
+        if doc.get("my_rating"):
+            features[2] = MY_RATING_WEIGHT * doc["my_rating"] / 100
+
+        genres = doc.get("genres") or []
+        for genre in genres:
+            # Делим на корень из числа жанров, чтобы многожанровые фильмы не доминировали
+            features[self._column(f"genre:{genre}")] = GENRE_WEIGHT / np.sqrt(len(genres))
+
+        language = doc.get("original_language")
+        if language:
+            features[self._column(f"lang:{language}")] = LANGUAGE_WEIGHT
+
+        return features
+
+    def _ensure_capacity(self, rows: int):
+        if rows > self._vectors.shape[0]:
+            capacity = max(rows, 2 * self._vectors.shape[0], 1024)
+            vectors = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+            vectors[:self.size] = self._vectors[:self.size]
+            self._vectors = vectors
+            self._series = np.resize(self._series, capacity)
+            self._my_ratings = np.resize(self._my_ratings, capacity)
+
+    def _upsert_doc(self, movie_id: str, doc: Dict):
+        features = self._encode(doc)
+        row = self._rows.get(movie_id)
+        if row is None:
+            row = self.size
+            self._ensure_capacity(row + 1)
+            self._ids.append(movie_id)
+            self._rows[movie_id] = row
+
+        vector = self._vectors[row]
+        vector[:] = 0
+        for column, value in features.items():
+            vector[column] = value
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+
+        self._series[row] = doc.get("content_type") == ContentType.SERIES.value
+        self._my_ratings[row] = doc.get("my_rating") or 0
+
+    def _remove_doc(self, movie_id: str):
+        row = self._rows.pop(movie_id, None)
+        if row is None:
+            return
+
+        # Переносим последнюю строку на место удаленной
+        last = self.size - 1
+        if row != last:
+            last_id = self._ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._series[row] = self._series[last]
+            self._my_ratings[row] = self._my_ratings[last]
+            self._ids[row] = last_id
+            self._rows[last_id] = row
+        self._vectors[last] = 0
+        self._ids.pop()
+
+    def _apply(self, movie_id: str, doc: Optional[Dict]):
+        if self._pending is not None:
+            # Идет построение: применим изменение после загрузки снимка
+            self._pending.append((movie_id, doc))
+        elif self._built:
+            if doc is None:
+                self._remove_doc(movie_id)
+            else:
+                self._upsert_doc(movie_id, doc)
+
+    def on_movie_saved(self, movie: Movie):
+        """Инкрементальное обновление после создания или изменения фильма"""
+        if movie.id:
+            self._apply(movie.id, movie.model_dump(mode="json"))
+
+    def on_documents_changed(self, docs: List[Dict]):
+        """Инкрементальное обновление по документам из базы с полями FEATURE_FIELDS"""
+        for doc in docs:
+            self._apply(str(doc["_id"]), doc)
+
+    def on_movie_deleted(self, movie_id: str):
+        """Инкрементальное обновление после удаления фильма"""
+        self._apply(movie_id, None)
+
+    def invalidate(self):
+        """Сбрасывает матрицу: при следующем запросе она будет построена заново"""
+        self._built = False
+        self._generation += 1
+
+    async def ensure_built(self):
+        if self._built:
+            return
+
+        async with self._build_lock:
+            if self._built:
+                return
+
+            db = get_database(for_read=True)
+            if db is None:
+                raise Exception("Не удалось получить базу данных")
+
+            started = datetime.now()
+            generation = self._generation
+            self._pending = []
+            try:
+                self._reset()
+                async for doc in db.movie.find({}, FEATURE_FIELDS):
+                    self._upsert_doc(str(doc["_id"]), doc)
+
+                for movie_id, doc in self._pending:
+                    if doc is None:
+                        self._remove_doc(movie_id)
+                    else:
+                        self._upsert_doc(movie_id, doc)
+                # Если во время чтения курсора матрицу сбросили, снимок мог не увидеть
+                # новые строки: оставляем ее непостроенной до следующего запроса
+                self._built = generation == self._generation
+            finally:
+                self._pending = None
+
+            elapsed = (datetime.now() - started).total_seconds()
+            logger.info(f"Матрица признаков построена: {self.size} x {len(self._vocabulary) + NUMERIC_COLUMNS} за {elapsed:.2f} с")
+            if not self._built:
+                logger.info("Матрица сброшена во время построения и будет перестроена при следующем запросе")
+
+    def _top_k(self, query: np.ndarray, limit: int, exclude: np.ndarray) -> List[Tuple[str, float]]:
+        """Косинусная близость к query пакетами строк, возвращает лучшие limit"""
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        for start in range(0, self.size, BATCH_ROWS):
+            stop = min(start + BATCH_ROWS, self.size)
+            scores = self._vectors[start:stop] @ query
+            scores[exclude[start:stop]] = -np.inf
+
+            if stop - start > limit:
+                candidates = np.argpartition(scores, -limit)[-limit:]
+            else:
+                candidates = np.arange(stop - start)
+            best_rows = np.concatenate([best_rows, candidates + start])
+            best_scores = np.concatenate([best_scores, scores[candidates]])
+
+            if len(best_rows) > limit:
+                keep = np.argpartition(best_scores, -limit)[-limit:]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores, kind="stable")
+        return [
+            (self._ids[best_rows[i]], float(best_scores[i]))
+            for i in order if np.isfinite(best_scores[i])
+        ]
+
+    def _type_mask(self, content_type: Optional[ContentType]) -> np.ndarray:
+        if content_type is None:
+            return np.zeros(self.size, dtype=bool)
+        return self._series[:self.size] != (content_type == ContentType.SERIES)
+
+    async def similar(self, movie_id: str, limit: int = 10, content_type: Optional[ContentType] = None) -> Optional[List[Tuple[str, float]]]:
+        """Похожие фильмы/сериалы. None, если фильм не найден"""
+        await self.ensure_built()
+
+        row = self._rows.get(movie_id)
+        if row is None:
+            return None
+
+        exclude = self._type_mask(content_type)
+        exclude[row] = True
+        return self._top_k(self._vectors[row].copy(), limit, exclude)
+
+    async def recommend(self, limit: int = 10, content_type: Optional[ContentType] = None) -> List[Tuple[str, float]]:
+        """Рекомендации по профилю из высоко оцененных фильмов среди еще не оцененных"""
+        await self.ensure_built()
+
+        ratings = self._my_ratings[:self.size]
+        liked = ratings >= LIKED_RATING
+        if not liked.any():
+            liked = ratings > 0
+        if not liked.any():
+            return []
+
+        # Профиль пользователя: средний вектор понравившегося, взвешенный оценкой
+        weights = ratings[liked] / 100
+        profile = weights @ self._vectors[:self.size][liked]
+        norm = np.linalg.norm(profile)
+        if norm == 0:
+            return []
+
+        exclude = self._type_mask(content_type) | (ratings > 0)
+        return self._top_k(profile / norm, limit, exclude)
+
+
+# Создаем экземпляр сервиса
+recommendation_service = RecommendationService()
@@ -0,0 +1,307 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import httpx
+import logging
+from models.movie import ContentType
+from database.mongodb import get_database
+from services.movie_service import movie_service
+from services.autocomplete_index import normalize_title
+from services.tmdb_service import get_tmdb_service
+
+logger = logging.getLogger("filmix.refresh_service")
+
+# Поля, которые меняются в TMDB со временем. Описание, оригинальное название и язык
+# пользователь редактирует сам, поэтому они не обновляются
+REFRESH_FIELDS = ["rating", "poster_url", "genres"]
+PROJECTION = {field: 1 for field in REFRESH_FIELDS + ["tmdb_id", "content_type"]}
+CHECKPOINT_ID = "tmdb_refresh"
+# Фильмы, добавленные до появления tmdb_id, сопоставляются с TMDB поиском по названию и году
+BACKFILL_PROJECTION = {"title": 1, "original_title": 1, "year": 1, "content_type": 1}
+
+
+def _new_stats() -> Dict:
+    return {"checked": 0, "updated": 0, "failed": 0, "missing": 0, "backfilled": 0, "unmatched": 0, "fields": {}}
+
+
+class RateLimiter:
+    """Не больше rate запусков запросов в секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            self._next = max(now, self._next) + self.interval
+
+
+class RefreshService:
+    def __init__(self):
+        self.interval_hours = float(os.getenv("TMDB_REFRESH_INTERVAL_HOURS", "0"))
+        self.batch_size = int(os.getenv("TMDB_REFRESH_BATCH_SIZE", "100"))
+        self.concurrency = int(os.getenv("TMDB_REFRESH_CONCURRENCY", "8"))
+        self.rate = float(os.getenv("TMDB_REFRESH_RATE", "20"))
+        # Недавно просмотренные и высоко оцененные обновляются в начале каждого прохода
+        self.priority_days = int(os.getenv("TMDB_REFRESH_PRIORITY_DAYS", "30"))
+        self.priority_rating = int(os.getenv("TMDB_REFRESH_PRIORITY_RATING", "80"))
+        self.priority_limit = int(os.getenv("TMDB_REFRESH_PRIORITY_LIMIT", "500"))
+        # Через сколько дней повторять поиск для фильмов, не найденных в TMDB
+        self.backfill_retry_days = int(os.getenv("TMDB_BACKFILL_RETRY_DAYS", "30"))
+
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+        logger.info("RefreshService инициализирован")
+
+    def _state_collection(self):
+        db = get_database()
+        if db is None:
+            raise Exception("Не удалось получить базу данных")
+        return db.refresh_state
+
+    async def _load_state(self) -> Dict:
+        return await self._state_collection().find_one({"_id": CHECKPOINT_ID}) or {}
+
+    async def _save_state(self, fields: Dict):
+        await self._state_collection().update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {**fields, "updated_at": datetime.now()}},
+            upsert=True
+        )
+
+    async def _next_run_delay(self) -> float:
+        """Секунды до следующего прохода: прерванный проход продолжается сразу,
+        завершенный повторяется через interval_hours после finished_at"""
+        state = await self._load_state()
+        if state.get("last_id") is not None or state.get("finished_at") is None:
+            return 0.0
+        elapsed = (datetime.now() - state["finished_at"]).total_seconds()
+        return max(self.interval_hours * 3600 - elapsed, 0.0)
+
+    async def _fetch(self, doc: Dict, limiter: RateLimiter, semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        tmdb_service = get_tmdb_service()
+        content_type = ContentType(doc.get("content_type", ContentType.MOVIE.value))
+
+        async with semaphore:
+            await limiter.wait()
+            try:
+                if content_type == ContentType.MOVIE:
+                    tmdb_data = await tmdb_service.get_movie_details(doc["tmdb_id"])
+                else:
+                    tmdb_data = await tmdb_service.get_tv_details(doc["tmdb_id"])
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    logger.warning(f"TMDB ID {doc['tmdb_id']} больше не существует, пропускаем {doc['_id']}")
+                    return None
+                raise
+
+        fresh = tmdb_service.convert_tmdb_to_movie_data(tmdb_data, content_type)
+        # Без голосов TMDB отдает vote_average=0: это отсутствие рейтинга, а не нулевой рейтинг
+        if not tmdb_data.get("vote_count"):
+            fresh.pop("rating", None)
+        return fresh
+
+    @staticmethod
+    def _diff(doc: Dict, fresh: Dict) -> Dict:
+        return {
+            field: fresh[field]
+            for field in REFRESH_FIELDS
+            # Пустые значения из TMDB не затирают уже сохраненные
+            if fresh.get(field) not in (None, "", []) and fresh[field] != doc.get(field)
+        }
+
+    @staticmethod
+    def _match(doc: Dict, results: List[Dict], content_type: ContentType) -> Optional[int]:
+        """TMDB ID первого результата поиска с тем же названием и годом (±1)"""
+        titles = {normalize_title(doc[field]) for field in ("title", "original_title") if doc.get(field)}
+        for item in results:
+            if content_type == ContentType.MOVIE:
+                names, date = (item.get("title"), item.get("original_title")), item.get("release_date") or ""
+            else:
+                names, date = (item.get("name"), item.get("original_name")), item.get("first_air_date") or ""
+            if not titles & {normalize_title(name) for name in names if name}:
+                continue
+            if doc.get("year") and date[:4].isdigit() and abs(int(date[:4]) - doc["year"]) > 1:
+                continue
+            return item.get("id")
+        return None
+
+    async def _lookup(self, doc: Dict, limiter: RateLimiter, semaphore: asyncio.Semaphore) -> Optional[int]:
+        tmdb_service = get_tmdb_service()
+        content_type = ContentType(doc.get("content_type", ContentType.MOVIE.value))
+        queries = list(dict.fromkeys(doc[field] for field in ("original_title", "title") if doc.get(field)))
+
+        for query in queries:
+            async with semaphore:
+                await limiter.wait()
+                if content_type == ContentType.MOVIE:
+                    data = await tmdb_service.search_movies(query)
+                else:
+                    data = await tmdb_service.search_tv_shows(query)
+            tmdb_id = self._match(doc, data.get("results", []), content_type)
+            if tmdb_id is not None:
+                return tmdb_id
+        return None
+
+    async def _backfill(self, limiter: RateLimiter, semaphore: asyncio.Semaphore, stats: Dict):
+        """Находит tmdb_id для фильмов, у которых его нет; не найденные повторяются через backfill_retry_days"""
+        collection = movie_service.get_read_collection()
+        query = {
+            "tmdb_id": None,
+            "$or": [
+                {"tmdb_lookup_at": {"$exists": False}},
+                {"tmdb_lookup_at": {"$lt": datetime.now() - timedelta(days=self.backfill_retry_days)}},
+            ],
+        }
+        last_id = None
+        while True:
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = await collection.find(query, BACKFILL_PROJECTION).sort("_id", 1).to_list(self.batch_size)
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+
+            results = await asyncio.gather(
+                *(self._lookup(doc, limiter, semaphore) for doc in docs),
+                return_exceptions=True
+            )
+            updates: List[Tuple[str, Dict]] = []
+            for doc, tmdb_id in zip(docs, results):
+                if isinstance(tmdb_id, Exception):
+                    # Ошибки сети не помечаются: поиск повторится в следующем проходе
+                    stats["failed"] += 1
+                    logger.error(f"Ошибка поиска {doc['_id']} в TMDB: {tmdb_id}")
+                elif tmdb_id is None:
+                    stats["unmatched"] += 1
+                    updates.append((str(doc["_id"]), {"tmdb_lookup_at": datetime.now()}))
+                else:
+                    stats["backfilled"] += 1
+                    updates.append((str(doc["_id"]), {"tmdb_id": tmdb_id}))
+            await movie_service.bulk_update_fields(updates)
+
+        logger.info(f"Сопоставление с TMDB: найдено {stats['backfilled']}, не найдено {stats['unmatched']}")
+
+    async def _refresh_batch(self, docs: List[Dict], limiter: RateLimiter, semaphore: asyncio.Semaphore, stats: Dict):
+        results = await asyncio.gather(
+            *(self._fetch(doc, limiter, semaphore) for doc in docs),
+            return_exceptions=True
+        )
+
+        updates: List[Tuple[str, Dict]] = []
+        for doc, fresh in zip(docs, results):
+            stats["checked"] += 1
+            if isinstance(fresh, Exception):
+                stats["failed"] += 1
+                logger.error(f"Ошибка обновления {doc['_id']} из TMDB: {fresh}")
+                continue
+            if fresh is None:
+                stats["missing"] += 1
+                continue
+
+            changes = self._diff(doc, fresh)
+            if changes:
+                updates.append((str(doc["_id"]), changes))
+                for field in changes:
+                    stats["fields"][field] = stats["fields"].get(field, 0) + 1
+
+        stats["updated"] += await movie_service.bulk_update_fields(updates)
+
+    async def run_once(self) -> Dict:
+        """Один проход: поиск недостающих tmdb_id, приоритетные фильмы, затем вся библиотека с места остановки"""
+        async with self._run_lock:
+            started = time.monotonic()
+            collection = movie_service.get_read_collection()
+            limiter = RateLimiter(self.rate)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            state = await self._load_state()
+            last_id = state.get("last_id")
+
+            if last_id is None:
+                stats = _new_stats()
+                await self._backfill(limiter, semaphore, stats)
+
+                priority_query = {
+                    "tmdb_id": {"$ne": None},
+                    "$or": [
+                        {"watch_date": {"$gte": datetime.now() - timedelta(days=self.priority_days)}},
+                        {"my_rating": {"$gte": self.priority_rating}},
+                    ],
+                }
+                priority = await collection.find(priority_query, PROJECTION) \
+                    .sort([("watch_date", -1), ("my_rating", -1)]) \
+                    .to_list(self.priority_limit)
+                for start in range(0, len(priority), self.batch_size):
+                    await self._refresh_batch(priority[start:start + self.batch_size], limiter, semaphore, stats)
+                priority_ids = [doc["_id"] for doc in priority]
+                await self._save_state({"last_id": None, "priority_ids": priority_ids, "finished_at": None, "stats": stats})
+                logger.info(f"Приоритетные фильмы обновлены: {len(priority)}")
+            else:
+                # Приоритетные фильмы этого прохода уже обновлены до перезапуска
+                stats = state.get("stats") or _new_stats()
+                priority_ids = state.get("priority_ids", [])
+                logger.info(f"Продолжаем обновление с {last_id}")
+
+            # Приоритетные фильмы при обходе всей библиотеки повторно не запрашиваются
+            skip_ids = set(priority_ids)
+            while True:
+                query = {"tmdb_id": {"$ne": None}}
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                docs = await collection.find(query, PROJECTION).sort("_id", 1).to_list(self.batch_size)
+                if not docs:
+                    break
+
+                batch = [doc for doc in docs if doc["_id"] not in skip_ids]
+                if batch:
+                    await self._refresh_batch(batch, limiter, semaphore, stats)
+                last_id = docs[-1]["_id"]
+                await self._save_state({"last_id": last_id, "stats": stats})
+
+            # Проход завершен: следующий начнется с начала библиотеки через interval_hours
+            await self._save_state({"last_id": None, "priority_ids": [], "finished_at": datetime.now(), "stats": stats})
+
+            stats["seconds"] = round(time.monotonic() - started, 1)
+            logger.info(f"Обновление из TMDB завершено: {stats}")
+            return stats
+
+    async def _loop(self):
+        while True:
+            try:
+                # Перезапуск процесса не начинает проход заново, если предыдущий завершен недавно
+                delay = await self._next_run_delay()
+                if delay > 0:
+                    logger.info(f"Следующее обновление из TMDB через {delay / 3600:.1f} ч")
+                    await asyncio.sleep(delay)
+                    continue
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении из TMDB: {e}")
+                await asyncio.sleep(self.interval_hours * 3600)
+
+    def start(self):
+        """Запускает периодическое обновление, если задан TMDB_REFRESH_INTERVAL_HOURS"""
+        if self.interval_hours > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Обновление из TMDB каждые {self.interval_hours} ч")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Создаем экземпляр сервиса
+refresh_service = RefreshService()
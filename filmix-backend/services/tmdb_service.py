@@ -1,8 +1,9 @@
 import httpx
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 from models.movie import ContentType
+from utils.tracing import trace_span
 
 logger = logging.getLogger("filmix.tmdb_service")
 
@@ -13,118 +14,145 @@ class TMDBService:
         self.image_base_url = os.getenv("TMDB_IMAGE_BASE_URL")
 
         if not self.api_key:
-            print('TMDB_API_KEY:', self.api_key)
             raise ValueError("TMDB_API_KEY не найден в переменных окружения")
 
+        # Общий клиент держит keep-alive соединения с TMDB между запросами
+        self.client: Optional[httpx.AsyncClient] = None
         logger.info("TMDB сервис инициализирован")
 
+    def get_client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(float(os.getenv("TMDB_TIMEOUT_SECONDS", "10"))),
+                limits=httpx.Limits(max_connections=int(os.getenv("TMDB_MAX_CONNECTIONS", "20")))
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _get(self, url: str, params: Dict, timeout: Optional[float] = None) -> httpx.Response:
+        """GET-запрос к TMDB с записью длительности в трассу текущего запроса"""
+        path = url[len(self.base_url):] if self.base_url and url.startswith(self.base_url) else url
+        with trace_span("tmdb", f"GET {path}"):
+            if timeout is None:
+                return await self.get_client().get(url, params=params)
+            return await self.get_client().get(url, params=params, timeout=timeout)
+
+    async def ping(self, timeout: float = 2.0) -> None:
+        """Проверка доступности TMDB легким запросом /configuration"""
+        response = await self._get(
+            f"{self.base_url}/configuration",
+            params={"api_key": self.api_key},
+            timeout=timeout
+        )
+        response.raise_for_status()
+
     async def search_movies(self, query: str, page: int = 1) -> Dict:
         """Поиск фильмов в TMDB"""
         logger.info(f"Поиск фильмов по запросу: {query}")
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/search/movie",
-                    params={
-                        "api_key": self.api_key,
-                        "query": query,
-                        "page": page,
-                        "language": "ru-RU"
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                logger.info(f"Найдено {data.get('total_results', 0)} результатов")
-                return data
-
-            except httpx.HTTPError as e:
-                logger.error(f"Ошибка при поиске фильмов: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Неожиданная ошибка при поиске: {e}")
-                raise
+        try:
+            response = await self._get(
+                f"{self.base_url}/search/movie",
+                params={
+                    "api_key": self.api_key,
+                    "query": query,
+                    "page": page,
+                    "language": "ru-RU"
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            logger.info(f"Найдено {data.get('total_results', 0)} результатов")
+            return data
+
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при поиске фильмов: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при поиске: {e}")
+            raise
 
     async def search_tv_shows(self, query: str, page: int = 1) -> Dict:
         """Поиск сериалов в TMDB"""
         logger.info(f"Поиск сериалов по запросу: {query}")
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/search/tv",
-                    params={
-                        "api_key": self.api_key,
-                        "query": query,
-                        "page": page,
-                        "language": "ru-RU"
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                logger.info(f"Найдено {data.get('total_results', 0)} результатов")
-                return data
-
-            except httpx.HTTPError as e:
-                logger.error(f"Ошибка при поиске сериалов: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Неожиданная ошибка при поиске: {e}")
-                raise
+        try:
+            response = await self._get(
+                f"{self.base_url}/search/tv",
+                params={
+                    "api_key": self.api_key,
+                    "query": query,
+                    "page": page,
+                    "language": "ru-RU"
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            logger.info(f"Найдено {data.get('total_results', 0)} результатов")
+            return data
+
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при поиске сериалов: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при поиске: {e}")
+            raise
 
     async def get_movie_details(self, movie_id: int) -> Dict:
         """Получить детальную информацию о фильме"""
         logger.info(f"Получение деталей фильма с TMDB ID: {movie_id}")
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/movie/{movie_id}",
-                    params={
-                        "api_key": self.api_key,
-                        "language": "ru-RU"
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                logger.info(f"Получены детали фильма: {data.get('title', 'Неизвестно')}")
-                return data
-
-            except httpx.HTTPError as e:
-                logger.error(f"Ошибка при получении деталей фильма: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Неожиданная ошибка при получении деталей: {e}")
-                raise
+        try:
+            response = await self._get(
+                f"{self.base_url}/movie/{movie_id}",
+                params={
+                    "api_key": self.api_key,
+                    "language": "ru-RU"
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            logger.info(f"Получены детали фильма: {data.get('title', 'Неизвестно')}")
+            return data
+
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при получении деталей фильма: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при получении деталей: {e}")
+            raise
 
     async def get_tv_details(self, tv_id: int) -> Dict:
         """Получить детальную информацию о сериале"""
         logger.info(f"Получение деталей сериала с TMDB ID: {tv_id}")
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/tv/{tv_id}",
-                    params={
-                        "api_key": self.api_key,
-                        "language": "ru-RU"
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                logger.info(f"Получены детали сериала: {data.get('name', 'Неизвестно')}")
-                return data
-
-            except httpx.HTTPError as e:
-                logger.error(f"Ошибка при получении деталей сериала: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Неожиданная ошибка при получении деталей: {e}")
-                raise
+        try:
+            response = await self._get(
+                f"{self.base_url}/tv/{tv_id}",
+                params={
+                    "api_key": self.api_key,
+                    "language": "ru-RU"
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            logger.info(f"Получены детали сериала: {data.get('name', 'Неизвестно')}")
+            return data
+
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при получении деталей сериала: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при получении деталей: {e}")
+            raise
 
     def format_search_results(self, results: Dict, content_type: ContentType) -> List[Dict]:
         """Форматирование результатов поиска для фронтенда"""
@@ -174,7 +202,8 @@ class TMDBService:
                 "content_type": content_type.value,
                 "watch_date": None,
                 "my_rating": None,
-                "series_name": None
+                "series_name": None,
+                "tmdb_id": tmdb_data.get("id")
             }
         else:  # TV Show
             return {
@@ -190,7 +219,8 @@ class TMDBService:
                 "content_type": content_type.value,
                 "watch_date": None,
                 "my_rating": None,
-                "series_name": None
+                "series_name": None,
+                "tmdb_id": tmdb_data.get("id")
             }
 
     def _extract_director(self, tmdb_data: Dict) -> str:
@@ -205,5 +235,17 @@ class TMDBService:
             return creators[0].get("name", "")
         return ""
 
-# Создаем единственный экземпляр сервиса
-tmdb_service = TMDBService()
+_tmdb_service: Optional[TMDBService] = None
+
+def get_tmdb_service() -> TMDBService:
+    """Единственный экземпляр сервиса, создается при первом обращении"""
+    global _tmdb_service
+    if _tmdb_service is None:
+        _tmdb_service = TMDBService()
+    return _tmdb_service
+
+async def close_tmdb_service():
+    if _tmdb_service is not None:
+        await _tmdb_service.close()
+        logger.info("HTTP-клиент TMDB закрыт")
+
@@ -0,0 +1,300 @@
+import csv
+import io
+import json
+import zlib
+from enum import Enum
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+import logging
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from models.movie import Movie, MovieBase, MovieCreate, ContentType
+from services.movie_service import movie_service
+from services.collection_service import collection_service
+
+logger = logging.getLogger("filmix.transfer_service")
+
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+# Разделитель жанров в CSV
+GENRES_SEPARATOR = "|"
+GZIP_MAGIC = b"\x1f\x8b"
+# Ограничения памяти при загрузке: распакованная порция и длина одной строки (записи CSV)
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+MAX_LINE_BYTES = 1024 * 1024
+CSV_FIELDS = ["id"] + list(MovieBase.model_fields)
+
+
+class TransferFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def _csv_line(values: List) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+
+def _serialize(movie: Movie, export_format: TransferFormat) -> str:
+    data = movie.model_dump(mode="json")
+    if export_format == TransferFormat.NDJSON:
+        return json.dumps(data, ensure_ascii=False) + "\n"
+
+    data["genres"] = GENRES_SEPARATOR.join(data["genres"])
+    return _csv_line(["" if data[field] is None else data[field] for field in CSV_FIELDS])
+
+
+async def export_movies(
+    export_format: TransferFormat,
+    content_type: Optional[ContentType] = None,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """Потоковая выгрузка коллекции пакетами; в памяти держится не больше одного пакета"""
+    collection = movie_service.get_read_collection()
+    query = {"content_type": content_type.value} if content_type else {}
+    # wbits=31 — формат gzip
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    count = 0
+    if export_format == TransferFormat.CSV:
+        yield encode(_csv_line(CSV_FIELDS))
+
+    batch = []
+    async for movie_doc in collection.find(query).batch_size(EXPORT_BATCH_SIZE):
+        movie_doc["_id"] = str(movie_doc["_id"])
+        batch.append(_serialize(Movie(**movie_doc), export_format))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            count += len(batch)
+            chunk = encode("".join(batch))
+            batch.clear()
+            if chunk:
+                yield chunk
+
+    count += len(batch)
+    chunk = encode("".join(batch))
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+    logger.info(f"Выгружено {count} документов в формате {export_format.value}")
+
+
+def _decompress(decompressor, data: bytes) -> Iterator[bytes]:
+    """Распаковка порциями не больше DECOMPRESS_CHUNK_SIZE, чтобы gzip-бомба не заняла всю память"""
+    while True:
+        chunk = decompressor.decompress(data, DECOMPRESS_CHUNK_SIZE)
+        if chunk:
+            yield chunk
+        data = decompressor.unconsumed_tail
+        if not data and len(chunk) < DECOMPRESS_CHUNK_SIZE:
+            return
+
+
+async def _iter_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Распакованный поток; gzip распознается по сигнатуре"""
+    decompressor = None
+    # Первые байты копятся, пока не наберется сигнатура: первый чанк тела может быть короче нее
+    head: Optional[bytes] = b""
+
+    async for chunk in chunks:
+        if head is not None:
+            head += chunk
+            if len(head) < len(GZIP_MAGIC):
+                continue
+            chunk, head = head, None
+            if chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(31)
+        if decompressor:
+            for part in _decompress(decompressor, chunk):
+                yield part
+        else:
+            yield chunk
+
+    # Поток короче сигнатуры gzip — это обычный текст
+    if head:
+        yield head
+    if decompressor:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Union[bytes, ValueError]]:
+    """Разбивает поток на строки. Вместо строки длиннее MAX_LINE_BYTES выдается ошибка,
+    а сама строка пропускается до конца, не накапливаясь в памяти"""
+    pending = b""
+    skipping = False
+
+    async for chunk in _iter_chunks(chunks):
+        if skipping:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                continue
+            chunk = chunk[newline + 1:]
+            skipping = False
+
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line if len(line) <= MAX_LINE_BYTES else _line_too_long()
+        if len(pending) > MAX_LINE_BYTES:
+            yield _line_too_long()
+            pending = b""
+            skipping = True
+
+    if pending and not skipping:
+        yield pending if len(pending) <= MAX_LINE_BYTES else _line_too_long()
+
+
+def _line_too_long() -> ValueError:
+    return ValueError(f"Строка длиннее {MAX_LINE_BYTES} байт")
+
+
+def _decode(line: bytes, line_number: int) -> str:
+    # BOM, который добавляют табличные редакторы, может стоять только в первой строке.
+    # \r не отрезается: внутри многострочного поля CSV он часть значения
+    return line.decode("utf-8-sig" if line_number == 1 else "utf-8")
+
+
+async def _iter_ndjson_rows(lines: AsyncIterator[Union[bytes, ValueError]]) -> AsyncIterator[Tuple[int, Union[Dict, Exception]]]:
+    """Пары (номер строки, документ или ошибка разбора)"""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        try:
+            if isinstance(line, ValueError):
+                raise line
+            text = _decode(line, line_number)
+            if text.strip():
+                yield line_number, json.loads(text)
+        except ValueError as e:
+            yield line_number, e
+
+
+def _csv_row(header: List[str], values: List[str]) -> Dict:
+    row = {field: (value if value != "" else None) for field, value in zip(header, values)}
+    if "genres" in row:
+        row["genres"] = row["genres"].split(GENRES_SEPARATOR) if row["genres"] else []
+    return row
+
+
+async def _iter_csv_rows(lines: AsyncIterator[Union[bytes, ValueError]]) -> AsyncIterator[Tuple[int, Union[Dict, Exception]]]:
+    """Пары (номер первой строки записи, документ или ошибка разбора)"""
+    header = None
+    record = ""
+    record_start = line_number = 0
+
+    async for line in lines:
+        line_number += 1
+        try:
+            if isinstance(line, ValueError):
+                raise line
+            text = _decode(line, line_number)
+        except ValueError as e:
+            record = ""
+            yield line_number, e
+            continue
+
+        if not record:
+            record_start = line_number
+        record = f"{record}\n{text}" if record else text
+        # Запись закончена, когда кавычки сбалансированы (внутри поля они удваиваются)
+        if record.count('"') % 2:
+            if len(record) > MAX_LINE_BYTES:
+                record = ""
+                yield record_start, ValueError(f"Запись длиннее {MAX_LINE_BYTES} символов")
+            continue
+
+        try:
+            # \r в конце законченной записи — перевод строки CRLF, а не данные
+            values = next(csv.reader([record.removesuffix("\r")]), [])
+        except csv.Error as e:
+            yield record_start, e
+            continue
+        finally:
+            record = ""
+
+        if not values:
+            continue
+        if header is None:
+            header = values
+            continue
+        yield record_start, _csv_row(header, values)
+
+    if record:
+        yield record_start, ValueError("Незакрытая кавычка в конце файла")
+
+
+def _format_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+    return str(error)
+
+
+async def import_movies(chunks: AsyncIterator[bytes], import_format: TransferFormat) -> Dict:
+    """Потоковая загрузка: строки валидируются по MovieCreate и пишутся пакетами bulk_write"""
+    lines = _iter_lines(chunks)
+    rows = _iter_ndjson_rows(lines) if import_format == TransferFormat.NDJSON else _iter_csv_rows(lines)
+
+    summary = {"processed": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    # (номер строки, id из выгрузки, фильм)
+    batch: List[Tuple[int, Optional[str], MovieCreate]] = []
+
+    def add_error(row_number: int, message: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": row_number, "error": message})
+
+    async def flush():
+        try:
+            inserted, updated = await movie_service.bulk_upsert_movies(
+                [(movie_id, movie) for _, movie_id, movie in batch]
+            )
+        except BulkWriteError as e:
+            # Запись неупорядоченная: остальные строки пакета уже сохранены
+            details = e.details
+            inserted = details.get("nInserted", 0) + details.get("nUpserted", 0)
+            updated = details.get("nMatched", 0)
+            for write_error in details.get("writeErrors", []):
+                add_error(batch[write_error["index"]][0], write_error.get("errmsg", "Ошибка записи"))
+        summary["inserted"] += inserted
+        summary["updated"] += updated
+        batch.clear()
+
+    async for row_number, row in rows:
+        summary["processed"] += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            if not isinstance(row, dict):
+                raise ValueError("Ожидался JSON-объект")
+            # MovieCreate не содержит id, а он нужен, чтобы повторная загрузка выгрузки не дублировала документы
+            movie_id = row.get("id") or row.get("_id")
+            batch.append((row_number, str(movie_id) if movie_id else None, MovieCreate(**row)))
+        except (ValidationError, ValueError, csv.Error) as e:
+            add_error(row_number, _format_error(e))
+            continue
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+
+    if summary["inserted"] or summary["updated"]:
+        try:
+            await collection_service.refresh_all()
+        except Exception as e:
+            logger.error(f"Не удалось пересчитать сводки франшиз после загрузки: {e}")
+
+    logger.info(
+        f"Загрузка {import_format.value} завершена: обработано {summary['processed']}, "
+        f"создано {summary['inserted']}, обновлено {summary['updated']}, ошибок {summary['failed']}"
+    )
+    return summary
@@ -0,0 +1,88 @@
+from pathlib import Path
+import pytest
+from services import autocomplete_index
+from services.autocomplete_index import AutocompleteIndex, build_index, iter_export_records, normalize_title
+
+# Фрагмент ежедневного экспорта TMDB: 19 подходящих записей, а также запись для взрослых,
+# пустое название и некорректная строка, которые должны быть пропущены
+EXPORT_PATH = Path(__file__).parent / "fixtures" / "tmdb_export_sample.json.gz"
+PREFIXES = ["s", "star", "star wars", "the", "e", "f", "기", "ハ", "wall", "zzz"]
+
+
+def expected(prefix: str, limit: int = 10):
+    """Эталон перебором: все записи экспорта с префиксом по убыванию популярности"""
+    key = normalize_title(prefix)
+    matches = [record for record in iter_export_records(EXPORT_PATH) if record[0].startswith(key)]
+    matches.sort(key=lambda record: -record[1])
+    return [record[2] for record in matches[:limit]]
+
+
+def build(tmp_path: Path, name: str = "index.bin", **kwargs) -> AutocompleteIndex:
+    index_path = tmp_path / name
+    build_index(EXPORT_PATH, index_path, **kwargs)
+    return AutocompleteIndex(index_path)
+
+
+def ids(results):
+    return [item["tmdb_id"] for item in results]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = build(tmp_path)
+    yield index
+    index.close()
+
+
+def test_build_skips_invalid_records(tmp_path):
+    assert build_index(EXPORT_PATH, tmp_path / "all.bin") == 19
+    assert build_index(EXPORT_PATH, tmp_path / "popular.bin", min_popularity=1.0) == 18
+
+
+def test_prefix_ranked_by_popularity(index):
+    results = index.search("star")
+    assert ids(results) == [11, 140607, 13475, 181808]
+    assert results[0] == {"tmdb_id": 11, "title": "Star Wars", "popularity": 90.2}
+    assert ids(index.search("star", limit=2)) == [11, 140607]
+
+
+@pytest.mark.parametrize("prefix", PREFIXES)
+def test_matches_brute_force(index, prefix):
+    assert ids(index.search(prefix)) == expected(prefix)
+
+
+def test_diacritics_and_case_are_ignored(index):
+    assert normalize_title("  Le Fabuleux  Destin d'AMÉLIE ") == "le fabuleux destin d'amelie"
+    assert ids(index.search("LE FABULEUX DESTIN D'AMELIE")) == [194]
+    assert ids(index.search("le fabuleux destin d'amélie")) == [194]
+    assert ids(index.search("eiga")) == ids(index.search("ĒIGA")) == [12477]
+
+
+def test_empty_query(index):
+    assert index.search("") == []
+    assert index.search("   ") == []
+
+
+def test_hot_prefixes(tmp_path, monkeypatch):
+    # На маленьком экспорте горячие префиксы появляются только при малом SCAN_LIMIT
+    monkeypatch.setattr(autocomplete_index, "SCAN_LIMIT", 2)
+    index = build(tmp_path)
+    try:
+        assert index.hot_size > 0
+        for prefix in PREFIXES:
+            assert ids(index.search(prefix)) == expected(prefix)
+    finally:
+        index.close()
+
+
+def test_spilled_build_matches_in_memory(tmp_path, monkeypatch):
+    in_memory = build(tmp_path, "memory.bin")
+    monkeypatch.setattr(autocomplete_index, "SPILL_CHUNK_SIZE", 4)
+    spilled = build(tmp_path, "spilled.bin")
+    try:
+        assert len(spilled) == len(in_memory)
+        for prefix in PREFIXES:
+            assert spilled.search(prefix) == in_memory.search(prefix)
+    finally:
+        spilled.close()
+        in_memory.close()
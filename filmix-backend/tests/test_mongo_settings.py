@@ -0,0 +1,84 @@
+import pytest
+from pydantic import ValidationError
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from database import settings as module
+from database.settings import MongoSettings
+
+
+@pytest.fixture
+def installed_compressors(monkeypatch):
+    # Проверка не должна зависеть от того, какие модули сжатия стоят в окружении
+    for compressor in module.COMPRESSOR_MODULES:
+        monkeypatch.setitem(module.COMPRESSOR_MODULES, compressor, "zlib")
+
+
+def test_defaults():
+    settings = MongoSettings()
+    assert settings.client_options() == {
+        "maxPoolSize": 100, "minPoolSize": 0, "connectTimeoutMS": 20000,
+        "serverSelectionTimeoutMS": 30000, "w": 1,
+    }
+    assert settings.read_preference_mode() == Primary()
+
+
+@pytest.mark.parametrize("value, expected", [("2", 2), ("majority", "majority"), (1, 1)])
+def test_write_concern_accepted(value, expected):
+    assert MongoSettings(write_concern=value).write_concern == expected
+
+
+@pytest.mark.parametrize("values", [
+    {"write_concern": "0"},
+    {"write_concern": 0, "write_journal": True},
+    {"write_concern": "-1"},
+    {"write_concern": "all"},
+    {"min_pool_size": 20, "max_pool_size": 10},
+    {"max_staleness_seconds": 120},
+    {"read_preference": "secondary", "max_staleness_seconds": 10},
+    {"compressors": "gzip"},
+    {"zlib_compression_level": 10},
+])
+def test_invalid_settings(values):
+    with pytest.raises(ValidationError):
+        MongoSettings(**values)
+
+
+def test_compressors_parsed_from_string(installed_compressors):
+    settings = MongoSettings(compressors=" zstd, zlib ,", zlib_compression_level=3)
+    assert settings.compressors == ["zstd", "zlib"]
+    options = settings.client_options()
+    assert options["compressors"] == "zstd,zlib"
+    assert options["zlibCompressionLevel"] == 3
+
+    options = MongoSettings(compressors="snappy", zlib_compression_level=3).client_options()
+    assert options["compressors"] == "snappy"
+    assert "zlibCompressionLevel" not in options
+
+
+def test_missing_compressor_module_is_rejected(monkeypatch, installed_compressors):
+    monkeypatch.setitem(module.COMPRESSOR_MODULES, "zstd", "filmix_missing_zstandard")
+    with pytest.raises(ValidationError, match="filmix_missing_zstandard"):
+        MongoSettings(compressors="zlib,zstd")
+    assert MongoSettings(compressors="zlib").compressors == ["zlib"]
+
+
+def test_from_env(monkeypatch, installed_compressors):
+    monkeypatch.setenv("MONGODB_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGODB_MIN_POOL_SIZE", "5")
+    monkeypatch.setenv("MONGODB_SOCKET_TIMEOUT_MS", "")
+    monkeypatch.setenv("MONGODB_COMPRESSORS", "zstd")
+    monkeypatch.setenv("MONGODB_WRITE_CONCERN", "majority")
+    monkeypatch.setenv("MONGODB_WRITE_JOURNAL", "true")
+    monkeypatch.setenv("MONGODB_WRITE_TIMEOUT_MS", "5000")
+    monkeypatch.setenv("MONGODB_MAX_IDLE_TIME_MS", "60000")
+
+    assert MongoSettings.from_env().client_options() == {
+        "maxPoolSize": 50, "minPoolSize": 5, "connectTimeoutMS": 20000,
+        "serverSelectionTimeoutMS": 30000, "w": "majority", "maxIdleTimeMS": 60000,
+        "journal": True, "wTimeoutMS": 5000, "compressors": "zstd",
+    }
+
+
+def test_read_preference_mode():
+    mode = MongoSettings(read_preference="secondaryPreferred", max_staleness_seconds=120).read_preference_mode()
+    assert mode == SecondaryPreferred(max_staleness=120)
+    assert MongoSettings(read_preference="secondaryPreferred").read_preference_mode() == SecondaryPreferred()
@@ -0,0 +1,173 @@
+import asyncio
+import numpy as np
+import pytest
+from models.movie import ContentType
+from services import recommendation_service as module
+from services.recommendation_service import RecommendationService
+
+DOCS = [
+    {"_id": "drama-2000", "genres": ["Драма"], "year": 2000, "original_language": "en", "rating": 7.5, "my_rating": 90, "content_type": "MOVIE"},
+    {"_id": "drama-2001", "genres": ["Драма"], "year": 2001, "original_language": "en", "rating": 7.0, "my_rating": None, "content_type": "MOVIE"},
+    {"_id": "drama-crime", "genres": ["Драма", "Криминал"], "year": 1995, "original_language": "en", "rating": 8.0, "my_rating": None, "content_type": "MOVIE"},
+    {"_id": "comedy-fr", "genres": ["Комедия"], "year": 1965, "original_language": "fr", "rating": 6.0, "my_rating": None, "content_type": "MOVIE"},
+    {"_id": "drama-series", "genres": ["Драма"], "year": 2010, "original_language": "en", "rating": 8.5, "my_rating": None, "content_type": "SERIES"},
+    {"_id": "anime", "genres": ["Мультфильм", "Фэнтези"], "year": 2001, "original_language": "ja", "rating": 8.5, "my_rating": 40, "content_type": "MOVIE"},
+]
+
+
+class FakeCursor:
+    """Асинхронный курсор; on_doc вызывается после выдачи каждого документа"""
+
+    def __init__(self, docs, on_doc=None):
+        self.docs = docs
+        self.on_doc = on_doc
+
+    async def __aiter__(self):
+        for doc in list(self.docs):
+            yield dict(doc)
+            if self.on_doc:
+                self.on_doc()
+
+
+class FakeDatabase:
+    def __init__(self, docs, on_doc=None):
+        self.docs = docs
+        self.on_doc = on_doc
+        self.movie = self
+
+    def find(self, query, projection):
+        return FakeCursor(self.docs, self.on_doc)
+
+
+def built_service(monkeypatch, docs, on_doc=None) -> RecommendationService:
+    service = RecommendationService()
+    monkeypatch.setattr(module, "get_database", lambda for_read=False: FakeDatabase(docs, on_doc))
+    asyncio.run(service.ensure_built())
+    return service
+
+
+def scores(service: RecommendationService, movie_id: str):
+    return dict(asyncio.run(service.similar(movie_id, limit=100)))
+
+
+def test_similar_ranks_by_cosine(monkeypatch):
+    service = built_service(monkeypatch, DOCS)
+    results = asyncio.run(service.similar("drama-2000", limit=3))
+    assert [movie_id for movie_id, _ in results] == ["drama-2001", "drama-series", "drama-crime"]
+    assert results[0][1] > results[1][1] > results[2][1]
+    assert asyncio.run(service.similar("missing")) is None
+
+
+def test_similar_filters_content_type(monkeypatch):
+    service = built_service(monkeypatch, DOCS)
+    series = asyncio.run(service.similar("drama-2000", content_type=ContentType.SERIES))
+    assert [movie_id for movie_id, _ in series] == ["drama-series"]
+
+
+def test_top_k_across_batches_matches_full_sort(monkeypatch):
+    monkeypatch.setattr(module, "BATCH_ROWS", 4)
+    rng = np.random.default_rng(7)
+    genres = ["Драма", "Комедия", "Триллер", "Фэнтези", "Ужасы"]
+    docs = [
+        {
+            "_id": f"m{i}", "genres": list(rng.choice(genres, size=rng.integers(1, 3), replace=False)),
+            "year": int(rng.integers(1950, 2024)), "original_language": str(rng.choice(["en", "fr", "ru"])),
+            "rating": float(rng.uniform(1, 10)), "my_rating": None, "content_type": "MOVIE",
+        }
+        for i in range(23)
+    ]
+    service = built_service(monkeypatch, docs)
+
+    query = service._vectors[5].copy()
+    exclude = np.zeros(service.size, dtype=bool)
+    exclude[5] = True
+    expected_scores = service._vectors[:service.size] @ query
+    expected_scores[5] = -np.inf
+    expected = [service._ids[i] for i in np.argsort(-expected_scores, kind="stable")[:6]]
+
+    results = service._top_k(query, 6, exclude)
+    assert len(results) == 6
+    assert [movie_id for movie_id, _ in results] == expected
+
+
+def test_remove_doc_moves_last_row(monkeypatch):
+    service = built_service(monkeypatch, DOCS)
+    last_vector = service._vectors[service.size - 1].copy()
+
+    service.on_movie_deleted("drama-2000")
+    assert service.size == len(DOCS) - 1
+    assert "drama-2000" not in service._rows
+    assert service._ids[0] == "anime"
+    assert service._rows["anime"] == 0
+    np.testing.assert_array_equal(service._vectors[0], last_vector)
+    assert all(service._ids[row] == movie_id for movie_id, row in service._rows.items())
+
+    service.on_movie_deleted("drama-2000")
+    assert service.size == len(DOCS) - 1
+
+
+def test_incremental_updates_match_rebuild(monkeypatch):
+    service = built_service(monkeypatch, DOCS[:4])
+    docs = {doc["_id"]: dict(doc) for doc in DOCS[:4]}
+
+    # Новый жанр и язык добавляют колонки после построения матрицы
+    for doc in DOCS[4:]:
+        docs[doc["_id"]] = dict(doc)
+        service.on_documents_changed([doc])
+    docs["comedy-fr"].update(genres=["Комедия", "Мелодрама"], rating=7.9)
+    service.on_documents_changed([docs["comedy-fr"]])
+    del docs["drama-2001"]
+    service.on_movie_deleted("drama-2001")
+
+    rebuilt = built_service(monkeypatch, list(docs.values()))
+    assert sorted(service._ids) == sorted(rebuilt._ids)
+    for movie_id in docs:
+        incremental, full = scores(service, movie_id), scores(rebuilt, movie_id)
+        assert incremental.keys() == full.keys()
+        for other in full:
+            assert incremental[other] == pytest.approx(full[other], abs=1e-6)
+
+
+def test_changes_during_build_are_applied(monkeypatch):
+    service = RecommendationService()
+    added = dict(DOCS[1])
+
+    def on_doc():
+        if service._pending == []:
+            service.on_documents_changed([added])
+            service.on_movie_deleted("drama-2000")
+
+    monkeypatch.setattr(module, "get_database", lambda for_read=False: FakeDatabase(DOCS[:1] + DOCS[2:], on_doc))
+    asyncio.run(service.ensure_built())
+    assert service._built
+    assert "drama-2001" in service._rows
+    assert "drama-2000" not in service._rows
+
+
+def test_invalidate_during_build_is_not_lost(monkeypatch):
+    docs = list(DOCS[:3])
+    service = RecommendationService()
+
+    def on_doc():
+        # Пакет загрузки записан после того, как курсор прочитал снимок
+        if len(docs) == 3:
+            docs.append(DOCS[3])
+            service.invalidate()
+
+    database = FakeDatabase(docs, on_doc)
+    monkeypatch.setattr(module, "get_database", lambda for_read=False: database)
+    asyncio.run(service.ensure_built())
+    assert not service._built
+
+    database.on_doc = None
+    asyncio.run(service.ensure_built())
+    assert service._built
+    assert "comedy-fr" in service._rows
+
+
+def test_recommend_skips_rated(monkeypatch):
+    service = built_service(monkeypatch, DOCS)
+    results = [movie_id for movie_id, _ in asyncio.run(service.recommend(limit=10))]
+    assert results[0] == "drama-2001"
+    assert "drama-2000" not in results and "anime" not in results
+    assert set(results) == {"drama-2001", "drama-crime", "drama-series", "comedy-fr"}
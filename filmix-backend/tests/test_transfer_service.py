@@ -0,0 +1,203 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from services import transfer_service
+from services.transfer_service import TransferFormat, export_movies, import_movies
+
+MOVIES = [
+    {
+        "_id": ObjectId(), "title": "Амели", "original_title": "Le Fabuleux Destin d'Amélie Poulain",
+        "original_language": "fr", "series_name": None, "year": 2001, "director": "Жан-Пьер Жёне",
+        "genres": ["Комедия", "Мелодрама"], "rating": 7.9, "my_rating": 95,
+        "watch_date": datetime(2024, 1, 15), "description": "Многострочное описание,\nс \"кавычками\", запятыми\r\nи | разделителем",
+        "poster_url": None, "content_type": "MOVIE", "tmdb_id": 194,
+    },
+    {
+        "_id": ObjectId(), "title": "Шрек 2", "original_title": "Shrek 2", "original_language": "en",
+        "series_name": "Шрек", "year": 2004, "director": "Эндрю Адамсон", "genres": [],
+        "rating": None, "my_rating": None, "watch_date": None, "description": "",
+        "poster_url": "https://image.tmdb.org/t/p/w500/shrek2.jpg", "content_type": "MOVIE", "tmdb_id": None,
+    },
+]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class FakeCollection:
+    def find(self, query):
+        return FakeCursor(MOVIES)
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Перехватывает запись в базу: список пакетов [(id, MovieCreate)]"""
+    batches = []
+
+    async def bulk_upsert_movies(movies):
+        batches.append(list(movies))
+        return len(movies), 0
+
+    async def refresh_all():
+        return 0
+
+    monkeypatch.setattr(transfer_service.movie_service, "get_read_collection", lambda: FakeCollection())
+    monkeypatch.setattr(transfer_service.movie_service, "bulk_upsert_movies", bulk_upsert_movies)
+    monkeypatch.setattr(transfer_service.collection_service, "refresh_all", refresh_all)
+    return batches
+
+
+def export(export_format: TransferFormat, compress: bool = False) -> bytes:
+    return b"".join(asyncio.run(collect(export_movies(export_format, compress=compress))))
+
+
+def run_import(data: bytes, import_format: TransferFormat, chunk_size: int = 1024):
+    return asyncio.run(import_movies(chunked(data, chunk_size), import_format))
+
+
+@pytest.mark.parametrize("import_format", list(TransferFormat))
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_round_trip(written, import_format, compress, chunk_size):
+    data = export(import_format, compress)
+    assert data.startswith(transfer_service.GZIP_MAGIC) == compress
+
+    summary = run_import(data, import_format, chunk_size)
+    assert summary == {"processed": 2, "inserted": 2, "updated": 0, "failed": 0, "errors": []}
+
+    imported = [(movie_id, movie.model_dump()) for batch in written for movie_id, movie in batch]
+    expected = []
+    for doc in MOVIES:
+        movie = {key: value for key, value in doc.items() if key != "_id"}
+        movie["content_type"] = transfer_service.ContentType(movie["content_type"])
+        expected.append((str(doc["_id"]), movie))
+    if import_format == TransferFormat.CSV:
+        # В CSV пустая строка и отсутствие значения неразличимы
+        expected[1][1]["description"] = None
+    assert imported == expected
+
+
+def test_csv_multiline_quoted_field_keeps_row_number(written):
+    data = (
+        'title,year,director,genres,description\n'
+        'Первый,2001,Режиссер,Драма|Криминал,"строка 1\nстрока ""2"", с запятой\nстрока 3"\n'
+        'Второй,2002,Режиссер,,\n'
+        'Третий,не год,Режиссер,,\n'
+    ).encode("utf-8")
+    summary = run_import(data, TransferFormat.CSV)
+
+    assert summary["processed"] == 3
+    assert summary["failed"] == 1
+    assert summary["errors"][0]["row"] == 6
+    assert summary["errors"][0]["error"].startswith("year:")
+    first, second = [movie for _, movie in written[0]]
+    assert first.description == 'строка 1\nстрока "2", с запятой\nстрока 3'
+    assert first.genres == ["Драма", "Криминал"]
+    assert second.genres == []
+
+
+def test_ndjson_error_rows(written):
+    lines = [
+        json.dumps({"title": "Ок", "year": 2000, "director": "Р", "genres": []}, ensure_ascii=False),
+        "{не json",
+        "[1, 2]",
+        "",
+        json.dumps({"title": "Без года", "director": "Р", "genres": []}, ensure_ascii=False),
+        json.dumps({"title": "Оценка", "year": 2000, "director": "Р", "genres": [], "my_rating": 500}, ensure_ascii=False),
+    ]
+    data = "\n".join(lines).encode("utf-8") + b"\n\xff\xfe\n"
+    summary = run_import(data, TransferFormat.NDJSON)
+
+    assert summary["processed"] == 6
+    assert summary["inserted"] == 1
+    assert [error["row"] for error in summary["errors"]] == [2, 3, 5, 6, 7]
+    assert summary["errors"][1]["error"] == "Ожидался JSON-объект"
+    assert summary["errors"][2]["error"].startswith("year:")
+
+
+def test_bulk_write_error_keeps_partial_results(monkeypatch, written):
+    async def bulk_upsert_movies(movies):
+        raise BulkWriteError({
+            "nInserted": 1, "nUpserted": 0, "nMatched": 1,
+            "writeErrors": [{"index": 2, "errmsg": "E11000 duplicate key"}],
+        })
+
+    monkeypatch.setattr(transfer_service.movie_service, "bulk_upsert_movies", bulk_upsert_movies)
+    data = "\n".join(
+        json.dumps({"title": f"Фильм {i}", "year": 2000, "director": "Р", "genres": []}) for i in range(3)
+    ).encode("utf-8")
+    summary = run_import(data, TransferFormat.NDJSON)
+    assert summary == {
+        "processed": 3, "inserted": 1, "updated": 1, "failed": 1,
+        "errors": [{"row": 3, "error": "E11000 duplicate key"}],
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_gzip_detected_with_short_first_chunks(chunk_size):
+    raw = b'{"a": 1}\n{"b": 2}'
+    lines = asyncio.run(collect(transfer_service._iter_lines(chunked(gzip.compress(raw), chunk_size))))
+    assert lines == [b'{"a": 1}', b'{"b": 2}']
+    assert asyncio.run(collect(transfer_service._iter_lines(chunked(b"x", 1)))) == [b"x"]
+
+
+def test_long_lines_become_errors(monkeypatch):
+    monkeypatch.setattr(transfer_service, "MAX_LINE_BYTES", 16)
+    raw = b"short\n" + b"x" * 100 + b"\nafter\n" + b"y" * 40
+    for data in (raw, gzip.compress(raw)):
+        lines = asyncio.run(collect(transfer_service._iter_lines(chunked(data, 5))))
+        assert [line if isinstance(line, bytes) else "error" for line in lines] == [b"short", "error", b"after", "error"]
+
+
+def test_gzip_bomb_is_decompressed_in_bounded_chunks(monkeypatch):
+    monkeypatch.setattr(transfer_service, "DECOMPRESS_CHUNK_SIZE", 1024)
+    sizes = []
+    original = transfer_service._decompress
+
+    def tracked(decompressor, data):
+        for part in original(decompressor, data):
+            sizes.append(len(part))
+            yield part
+
+    monkeypatch.setattr(transfer_service, "_decompress", tracked)
+    data = gzip.compress(b"a" * (4 << 20))
+    lines = asyncio.run(collect(transfer_service._iter_lines(chunked(data, 1 << 16))))
+    assert len(lines) == 1 and isinstance(lines[0], ValueError)
+    assert max(sizes) <= 1024
+    assert sum(sizes) == 4 << 20
+
+
+def test_csv_crlf_line_endings(written):
+    data = (
+        'title,year,director,genres,description\r\n'
+        'Первый,2001,Режиссер,Драма,"строка 1\r\nстрока 2"\r\n'
+        'Второй,2002,Режиссер,Драма,без кавычек\r\n'
+    ).encode("utf-8-sig")
+    summary = run_import(data, TransferFormat.CSV)
+
+    assert summary["failed"] == 0
+    first, second = [movie for _, movie in written[0]]
+    assert first.description == "строка 1\r\nстрока 2"
+    assert second.description == "без кавычек"
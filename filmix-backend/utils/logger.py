@@ -1,6 +1,16 @@
 import logging
 import sys
 from pathlib import Path
+from utils.tracing import request_id_var
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет ID текущего HTTP-запроса в каждую запись лога"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get() or "-"
+        return True
+
 
 def setup_logging():
     """Настройка логгирования для проекта"""
@@ -10,8 +20,9 @@ def setup_logging():
 
     # Настраиваем форматирование
     formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
     )
+    request_id_filter = RequestIdFilter()
 
     # Настраиваем логгер для приложения
     logger = logging.getLogger("filmix")
@@ -21,11 +32,13 @@ def setup_logging():
     file_handler = logging.FileHandler(log_dir / "filmix.log", encoding='utf-8')
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
+    file_handler.addFilter(request_id_filter)
 
     # Хэндлер для вывода в консоль
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(request_id_filter)
 
     # Добавляем хэндлеры к логгеру
     logger.addHandler(file_handler)
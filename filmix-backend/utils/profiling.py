@@ -0,0 +1,136 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+import logging
+from starlette.datastructures import Headers, MutableHeaders
+from utils.tracing import start_trace, finish_trace, current_spans
+
+logger = logging.getLogger("filmix.profiling")
+
+# ID из заголовка попадает в имя файла профиля, поэтому принимаем только безопасные символы
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class StackSampler:
+    """Статистический профайлер: периодически снимает стек потока цикла событий"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="filmix-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def save(self, path: Path):
+        """Сохраняет стеки в свернутом формате (flamegraph.pl, speedscope)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as profile_file:
+            for stack, count in self.samples.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+
+class RequestTracingMiddleware:
+    """ID запроса, журнал медленных запросов и профилирование по заголовку или выборке"""
+
+    def __init__(self, app):
+        self.app = app
+        self.slow_request_ms = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+        self.profiling_enabled = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.profile_header = os.getenv("PROFILING_HEADER", "X-Profile")
+        self.sample_rate = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.interval = float(os.getenv("PROFILING_INTERVAL_MS", "5")) / 1000
+        self.profile_dir = Path(os.getenv("PROFILING_DIR", "profiles"))
+
+    def _should_profile(self, headers: Headers) -> bool:
+        if not self.profiling_enabled:
+            return False
+        if headers.get(self.profile_header, "").lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_id = headers.get("X-Request-ID", "")
+        if not REQUEST_ID_PATTERN.match(request_id) or request_id.strip(".") == "":
+            request_id = uuid.uuid4().hex
+        sampler = None
+        if self._should_profile(headers):
+            # Профилируется весь поток цикла событий, поэтому в профиль попадут
+            # и параллельные запросы; для точной картины профилируйте под малой нагрузкой
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = MutableHeaders(scope=message)
+                response_headers["X-Request-ID"] = request_id
+                if sampler is not None:
+                    response_headers["X-Profile-ID"] = request_id
+            await send(message)
+
+        tokens = start_trace(request_id)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            spans = current_spans()
+            target = f"{scope['method']} {scope['path']}"
+
+            if sampler is not None:
+                sampler.stop()
+                profile_path = self.profile_dir / f"{request_id}.folded"
+                try:
+                    sampler.save(profile_path)
+                    logger.info(f"Профиль {target} сохранен: {profile_path} ({sum(sampler.samples.values())} выборок)")
+                except OSError as e:
+                    logger.error(f"Не удалось сохранить профиль: {e}")
+
+            if self.slow_request_ms > 0 and duration_ms >= self.slow_request_ms:
+                external_ms = sum(span["duration_ms"] for span in spans)
+                details = "\n".join(
+                    f"    {span['kind']:<5} {span['duration_ms']:>9.2f} ms  {span['name']}"
+                    + (f"  [{span['error']}]" if "error" in span else "")
+                    for span in spans
+                )
+                logger.warning(
+                    f"Медленный запрос {target} -> {status_code}: {duration_ms:.1f} ms, "
+                    f"внешние вызовы: {len(spans)} на {external_ms:.1f} ms" + (f"\n{details}" if details else "")
+                )
+
+            # Сбрасываем контекст последним, чтобы записи выше получили ID запроса
+            finish_trace(tokens)
@@ -0,0 +1,79 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from pymongo import monitoring
+
+# Контекст текущего запроса. Motor выполняет операции в пуле потоков, но копирует
+# contextvars, поэтому события драйвера видят запрос, который их вызвал.
+request_id_var: ContextVar[Optional[str]] = ContextVar("filmix_request_id", default=None)
+_spans_var: ContextVar[Optional[List[Dict]]] = ContextVar("filmix_spans", default=None)
+
+# Ограничение, чтобы запрос с тысячами getMore не раздувал память
+MAX_SPANS = 500
+
+
+def start_trace(request_id: str) -> Tuple:
+    """Начинает сбор внешних вызовов для запроса; вернуть токены в finish_trace"""
+    return request_id_var.set(request_id), _spans_var.set([])
+
+
+def current_spans() -> List[Dict]:
+    return list(_spans_var.get() or [])
+
+
+def finish_trace(tokens: Tuple):
+    request_token, spans_token = tokens
+    _spans_var.reset(spans_token)
+    request_id_var.reset(request_token)
+
+
+def record_span(kind: str, name: str, duration_ms: float, error: Optional[str] = None):
+    spans = _spans_var.get()
+    if spans is None or len(spans) >= MAX_SPANS:
+        return
+    span = {"kind": kind, "name": name, "duration_ms": round(duration_ms, 2)}
+    if error:
+        span["error"] = error
+    spans.append(span)
+
+
+@contextmanager
+def trace_span(kind: str, name: str):
+    """Замеряет вызов внешнего сервиса в рамках текущего запроса"""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record_span(kind, name, (time.perf_counter() - started) * 1000, error)
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Записывает каждую команду MongoDB с длительностью в трассу текущего запроса"""
+
+    def __init__(self):
+        self._names: Dict[int, str] = {}
+
+    def started(self, event):
+        if _spans_var.get() is None:
+            return
+        target = event.command.get(event.command_name)
+        name = event.command_name
+        if isinstance(target, str):
+            name = f"{name} {event.database_name}.{target}"
+        self._names[event.request_id] = name
+
+    def _finish(self, event, error: Optional[str] = None):
+        name = self._names.pop(event.request_id, None)
+        if name is not None:
+            record_span("mongo", name, event.duration_micros / 1000, error)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure.get("codeName") or event.failure.get("errmsg") or "failed"))